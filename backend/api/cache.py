@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+MODIFIED_KEY = 'modified:{}'
+
+
+def is_shared():
+    """Видны ли версии всем процессам. Кэш в памяти процесса допустим
+    только при отладке: изменения из команд manage.py не сбрасывают в нем
+    кэши работающего сервера."""
+    return (settings.CACHES['default']['BACKEND']
+            not in settings.PROCESS_LOCAL_CACHES)
+
+
+def _initial_version():
+    """Начальное значение версии. Время вместо единицы, чтобы после
+    вытеснения ключа из кэша версия не совпала с уже использованной."""
+    return time.time_ns()
+
+
+def get_version(name):
+    """Текущая версия набора данных name."""
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+
+    if version is None:
+        if cache.add(key, _initial_version(), timeout=None):
+            cache.set(MODIFIED_KEY.format(name), int(time.time()),
+                      timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(names):
+    """Версии нескольких наборов данных в порядке names."""
+    versions = cache.get_many([VERSION_KEY.format(name) for name in names])
+
+    return [
+        versions.get(VERSION_KEY.format(name)) or get_version(name)
+        for name in names
+    ]
+
+
+def get_last_modified(names):
+    """Время последнего изменения наборов данных names в секундах или
+    None, если для какого-то из них время неизвестно."""
+    keys = [MODIFIED_KEY.format(name) for name in names]
+    modified = cache.get_many(keys)
+
+    if len(modified) != len(keys):
+        return None
+    return max(modified.values())
+
+
+def bump_version(*names):
+    """Смена версии наборов данных. Ключи, построенные на старой версии,
+    перестают использоваться и вытесняются из кэша по таймауту."""
+    now = int(time.time())
+
+    for name in names:
+        key = VERSION_KEY.format(name)
+
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+    cache.set_many(
+        {MODIFIED_KEY.format(name): now for name in names}, timeout=None)
+
+
+def reset_versions(names):
+    """Новые версии сразу для многих наборов данных, например после
+    загрузки снимка БД. Записываются одним запросом к кэшу без чтения
+    прежних значений: начальное значение из времени не совпадает с уже
+    использованными версиями."""
+    version = _initial_version()
+    now = int(time.time())
+    values = {}
+
+    for name in names:
+        values[VERSION_KEY.format(name)] = version
+        values[MODIFIED_KEY.format(name)] = now
+
+    cache.set_many(values, timeout=None)
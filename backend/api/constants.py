@@ -1 +1,65 @@
 REQUERED_RECIPE_FIELDS = ['recipe_ingredients', 'tags']
+RECIPE_READ_ACTIONS = ['list', 'retrieve']
+KEYSET_ORDERING = ['-pub_date', '-id']
+
+# Способы подсчета общего количества объектов при пагинации.
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_ESTIMATE = 'estimate'
+COUNT_CACHE_TIMEOUT = 30
+COUNT_ESTIMATE_THRESHOLD = 10000
+
+# Кэш страниц ленты рецептов для анонимных пользователей.
+FEED_CACHE_ALIAS = 'feed'
+FEED_CACHE_TIMEOUT = 60
+FEED_CACHE_VERSIONS = ['recipe', 'tag', 'ingredient', 'user']
+# Поля автора в карточке рецепта: версия пользователей меняется только
+# при их изменении.
+FEED_USER_FIELDS = [
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants',
+]
+# Ключи фрагментов содержат версии, поэтому срок хранения большой.
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Множества id связей пользователя: избранное, корзина и подписки.
+RELATION_CACHE_TIMEOUT = 10 * 60
+
+# Размер части строк при выгрузке списка покупок.
+SHOPPING_LIST_CHUNK_SIZE = 2000
+
+# Обработка загруженных картинок: ширины уменьшенных копий, качество
+# сжатия и число фоновых потоков.
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
+IMAGE_WORKERS = 2
+
+# Ограничения загружаемых картинок. Предел размера тела запроса в nginx —
+# 10 МБ, строка base64 длиннее файла на треть.
+IMAGE_MAX_BYTES = 7 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+# Размер части строки base64 при декодировании, кратен 4.
+BASE64_CHUNK_SIZE = 64 * 1024
+# Размер части файла при вычислении хэша содержимого.
+MEDIA_HASH_CHUNK_SIZE = 64 * 1024
+
+# Очистка медиафайлов без ссылок: отсрочка для только что загруженных
+# файлов, размер части строк БД и размер отсортированной части ссылок.
+MEDIA_GC_GRACE_HOURS = 24
+MEDIA_QUERY_CHUNK_SIZE = 2000
+MEDIA_REFERENCES_CHUNK_SIZE = 100_000
+
+# Короткие ссылки: код из id рецепта длиной 6 символов base62, множитель
+# взаимно прост с 62. Рецепт по коду кэшируется до смены версии рецептов.
+SHORT_LINK_CODE_LENGTH = 6
+SHORT_LINK_MULTIPLIER = 2_654_435_761
+SHORT_LINK_OFFSET = 19_850_716_423
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60
+
+# Снимки БД: версия формата, уровень gzip (быстрый, узкое место — БД),
+# размер пакета строк без COPY и память для построения индексов.
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_COMPRESSLEVEL = 1
+SNAPSHOT_BATCH_SIZE = 2000
+SNAPSHOT_MAINTENANCE_WORK_MEM = '256MB'
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipe.models import Recipe
+from user.models import Favorite, Subscription
+
+User = get_user_model()
+
+
+def _count(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на объект полем
+    field."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), Value(0))
+
+
+# Хранимые счетчики: (модель, поле счетчика, модель строк, поле ссылки).
+COUNTERS = [
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'follow'),
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+]
+
+
+def change(model, pk, field, delta):
+    """Атомарное изменение счетчика на delta одним UPDATE. Значение не
+    опускается ниже нуля, даже если счетчик уже разошелся с данными."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))})
+
+
+def find_drift():
+    """Количество объектов с неверным значением по каждому счетчику."""
+    return {
+        f'{model.__name__}.{field}': model.objects.exclude(
+            **{field: _count(related_model, related_field)}).count()
+        for model, field, related_model, related_field in COUNTERS
+    }
+
+
+def reconcile():
+    """Исправить неверные значения. Обновляются только расходящиеся
+    строки, возвращается их количество по каждому счетчику."""
+    return {
+        f'{model.__name__}.{field}': model.objects.exclude(
+            **{field: _count(related_model, related_field)}
+        ).update(**{field: _count(related_model, related_field)})
+        for model, field, related_model, related_field in COUNTERS
+    }
@@ -0,0 +1,83 @@
+import hashlib
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from api.cache import get_versions
+from api.constants import (
+    FEED_CACHE_ALIAS, FEED_CACHE_TIMEOUT, FEED_CACHE_VERSIONS,
+)
+
+HITS_KEY = 'feed:hits'
+MISSES_KEY = 'feed:misses'
+
+
+def _get_cache():
+    return caches[FEED_CACHE_ALIAS]
+
+
+def _increment(key):
+    feed_cache = _get_cache()
+
+    try:
+        feed_cache.incr(key)
+    except ValueError:
+        # Ключа нет: создать его, не затирая значение, если другой
+        # процесс успел раньше.
+        if not feed_cache.add(key, 1, timeout=None):
+            feed_cache.incr(key)
+
+
+def make_key(request):
+    """Ключ страницы ленты: версии данных и нормализованные параметры.
+
+    Параметры и повторяющиеся значения сортируются, чтобы запросы
+    ?tags=a&tags=b и ?tags=b&tags=a попадали в одну запись. Хост входит
+    в ключ, так как ссылки next и previous абсолютные.
+    """
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists())
+    digest = hashlib.md5(
+        repr((request.get_host(), params)).encode(), usedforsecurity=False
+    ).hexdigest()
+    versions = ':'.join(
+        str(version) for version in get_versions(FEED_CACHE_VERSIONS))
+    return f'feed:{versions}:{digest}'
+
+
+def get_or_set(request, handler):
+    """Ответ из кэша или результат handler. Заголовок X-Cache показывает,
+    был ли ответ взят из кэша.
+
+    В кэш попадают только данные успешных ответов. Старые записи не
+    удаляются: после смены версии ключ меняется, и они вытесняются по
+    таймауту.
+    """
+    key = make_key(request)
+    feed_cache = _get_cache()
+    data = feed_cache.get(key)
+
+    if data is not None:
+        _increment(HITS_KEY)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    _increment(MISSES_KEY)
+    response = handler()
+
+    if response.status_code == 200:
+        feed_cache.set(key, response.data, FEED_CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def get_stats():
+    """Количество попаданий и промахов с последнего сброса."""
+    stats = _get_cache().get_many([HITS_KEY, MISSES_KEY])
+    return stats.get(HITS_KEY, 0), stats.get(MISSES_KEY, 0)
+
+
+def reset_stats():
+    _get_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -1,16 +1,11 @@
 import django_filters
 
+from api.constants import KEYSET_ORDERING
+from api.relations import FAVORITES, SHOPPING_CART, get_ids
+from api.search import full_text_search, ranked_name_search
 from recipe.models import Recipe
 
 
-class IngredientFilterSet(django_filters.FilterSet):
-    """Фильтрация по началу названия из параметра поиска name."""
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith',
-        label='Поиск по началу названия')
-
-
 class RecipeFilterSet(django_filters.FilterSet):
     """Фильтрация для страницы рецептов."""
     is_favorited = django_filters.CharFilter(
@@ -19,6 +14,12 @@ class RecipeFilterSet(django_filters.FilterSet):
         method='filter_is_in_shopping_cart')
     tags = django_filters.CharFilter(
         method='filter_tags')
+    search = django_filters.CharFilter(
+        method='filter_search',
+        label='Поиск по названию')
+    q = django_filters.CharFilter(
+        method='filter_q',
+        label='Полнотекстовый поиск по названию и описанию')
 
     def _get_user(self):
         """Получение пользователя."""
@@ -28,24 +29,22 @@ class RecipeFilterSet(django_filters.FilterSet):
             return request.user
         return None
 
-    def _get_user_relations(self, queryset, value, query_field):
-        """Вспомогательная функция для фильтрации по названию поля модели
-        и пользователю."""
+    def _get_user_relations(self, queryset, value, kind):
+        """Вспомогательная функция для фильтрации по id рецептов из кэша
+        связей пользователя."""
         user = self._get_user()
 
         if user and value:
-            filter_kwargs = {query_field: user}
-
-            return queryset.filter(**filter_kwargs)
+            return queryset.filter(id__in=get_ids(user.id, kind))
         return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         """Фильтрация по параметру поиска is_favorited."""
-        return self._get_user_relations(queryset, value, 'favorites__user')
+        return self._get_user_relations(queryset, value, FAVORITES)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         """Фильтрация по параметру поиска is_in_shopping_cart."""
-        return self._get_user_relations(queryset, value, 'shopping_cart__user')
+        return self._get_user_relations(queryset, value, SHOPPING_CART)
 
     def filter_tags(self, queryset, name, value):
         """Фильтрация по тэгам."""
@@ -54,7 +53,15 @@ class RecipeFilterSet(django_filters.FilterSet):
         if not tags_list:
             return queryset
 
-        return queryset.filter(tags__slug__in=tags_list)
+        return queryset.filter(tags__slug__in=tags_list).distinct()
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию рецепта из параметра search."""
+        return ranked_name_search(queryset, value, KEYSET_ORDERING)
+
+    def filter_q(self, queryset, name, value):
+        """Полнотекстовый поиск из параметра q."""
+        return full_text_search(queryset, value, KEYSET_ORDERING)
 
     class Meta:
         model = Recipe
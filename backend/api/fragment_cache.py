@@ -0,0 +1,58 @@
+from django.core.cache import caches
+
+from api.cache import get_versions
+from api.constants import FEED_CACHE_ALIAS, FRAGMENT_CACHE_TIMEOUT
+
+FRAGMENT_KEY = 'recipe-fragment:{}:{}'
+
+
+def _get_cache():
+    return caches[FEED_CACHE_ALIAS]
+
+
+def make_keys(request, recipes):
+    """Ключи фрагментов рецептов страницы.
+
+    Фрагмент зависит от самого рецепта, автора, тегов и ингредиентов,
+    поэтому в ключ входят их версии. Все версии читаются одним запросом
+    к кэшу. Адрес сайта входит в ключ, так как ссылки на изображения
+    абсолютные.
+    """
+    names = ['tag', 'ingredient']
+
+    for recipe in recipes:
+        names += [f'recipe:{recipe.id}', f'user:{recipe.author_id}']
+
+    versions = get_versions(names)
+    common = f'{request.build_absolute_uri("/")}:{versions[0]}:{versions[1]}'
+
+    return {
+        recipe.id: FRAGMENT_KEY.format(
+            recipe.id, f'{common}:{recipe_version}:{author_version}')
+        for recipe, recipe_version, author_version in zip(
+            recipes, versions[2::2], versions[3::2])
+    }
+
+
+def get_fragments(keys):
+    """Найденные в кэше фрагменты по id рецептов."""
+    cached = _get_cache().get_many(keys.values())
+    return {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+
+def set_fragments(keys, fragments):
+    """Сохранение фрагментов без полей, зависящих от пользователя."""
+    _get_cache().set_many({
+        keys[fragment['id']]: overlay(fragment, False, False, False)
+        for fragment in fragments
+    }, FRAGMENT_CACHE_TIMEOUT)
+
+
+def overlay(fragment, is_favorited, is_in_shopping_cart, is_subscribed):
+    """Фрагмент с флагами пользователя. Порядок полей не меняется."""
+    return {
+        **fragment,
+        'author': {**fragment['author'], 'is_subscribed': is_subscribed},
+        'is_favorited': is_favorited,
+        'is_in_shopping_cart': is_in_shopping_cart,
+    }
@@ -0,0 +1,226 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from api.constants import (
+    IMAGE_JPEG_QUALITY, IMAGE_VARIANT_WIDTHS, IMAGE_WEBP_QUALITY,
+    IMAGE_WORKERS, MEDIA_QUERY_CHUNK_SIZE,
+)
+from recipe.models import Recipe
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+JPEG = 'jpeg'
+PNG = 'png'
+WEBP = 'webp'
+METADATA_KEYS = ('exif', 'icc_profile', 'xmp', 'comment')
+
+# Модель: {поле картинки: поле с вариантами}.
+IMAGE_FIELDS = {
+    Recipe: {'image': 'image_variants'},
+    User: {'avatar': 'avatar_variants'},
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_WORKERS, thread_name_prefix='images')
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image, format):
+    """Картинка в формате format без метаданных: новый файл получает
+    только пиксели, EXIF и остальные данные исходного файла не
+    копируются."""
+    buffer = BytesIO()
+
+    if format == JPEG:
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=IMAGE_JPEG_QUALITY, optimize=True,
+            progressive=True)
+    elif format == WEBP:
+        image.save(buffer, 'WEBP', quality=IMAGE_WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, format.upper(), optimize=True)
+    return buffer.getvalue()
+
+
+def _is_normalized(image, format):
+    """Картинка уже сохранена в основном формате без метаданных, например
+    получена предыдущей обработкой: повторное сжатие только ухудшило бы
+    ее."""
+    return (
+        (image.format or '').lower() == format
+        and not image.getexif()
+        and not getattr(image, 'text', None)
+        and not any(key in image.info for key in METADATA_KEYS)
+    )
+
+
+def _store(directory, image, format):
+    """Сохранить картинку в каталог directory. Имя файла задает
+    хранилище по хэшу содержимого, одинаковые файлы не записываются
+    повторно."""
+    return default_storage.save(
+        os.path.join(directory, f'image.{format}'),
+        ContentFile(_encode(image, format)))
+
+
+def make_variants(name):
+    """Обработать загруженную картинку name.
+
+    Ориентация из EXIF применяется к пикселям, картинка сохраняется
+    заново без метаданных в основном формате: JPEG или PNG для картинок
+    с прозрачностью. Для каждой ширины из IMAGE_VARIANT_WIDTHS, меньшей
+    ширины картинки, сохраняются уменьшенные копии в основном формате и
+    в WebP. Файлы не перезаписываются: у каждого варианта свое имя по
+    хэшу содержимого.
+
+    Возвращает имя обработанной картинки и {формат: [[ширина, имя],
+    ...]} с вариантами по возрастанию ширины, включая полный размер.
+    """
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+
+    format = PNG if _has_alpha(image) else JPEG
+    normalized = _is_normalized(image, format)
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+
+    directory = os.path.dirname(name)
+    widths = [width for width in IMAGE_VARIANT_WIDTHS if width < image.width]
+    variants = {format: [], WEBP: []}
+
+    for width in widths:
+        resized = image.resize(
+            (width, max(round(image.height * width / image.width), 1)),
+            Image.Resampling.LANCZOS)
+
+        for variant_format in (format, WEBP):
+            variants[variant_format].append(
+                [width, _store(directory, resized, variant_format)])
+
+    if not normalized:
+        name = _store(directory, image, format)
+
+    variants[format].append([image.width, name])
+    variants[WEBP].append([image.width, _store(directory, image, WEBP)])
+    return name, variants
+
+
+def process(model, pk, field):
+    """Обработать картинку объекта и сохранить обработанную картинку и
+    варианты в модель.
+
+    Сохранение через save(update_fields=...) отправляет post_save, и
+    сигналы сбрасывают версии объекта в кэше. Если картинку успели
+    заменить, результат не сохраняется: новую картинку обработает
+    отдельная задача.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    name = instance and getattr(instance, field).name
+
+    if not name:
+        return
+
+    variants_field = IMAGE_FIELDS[model][field]
+    processed, variants = make_variants(name)
+
+    if model.objects.filter(pk=pk, **{field: name}).exists():
+        setattr(instance, field, processed)
+        setattr(instance, variants_field, variants)
+        instance.save(update_fields=[field, variants_field])
+
+
+def iter_referenced_names():
+    """Имена файлов, на которые ссылаются картинки объектов и их
+    варианты. Ссылки хранятся только в этих полях. Строки читаются из БД
+    частями, имена не накапливаются в памяти."""
+    for model, fields in IMAGE_FIELDS.items():
+        for field, variants_field in fields.items():
+            for name, variants in model.objects.exclude(
+                **{field: ''}
+            ).values_list(field, variants_field).iterator(
+                    chunk_size=MEDIA_QUERY_CHUNK_SIZE):
+                yield name
+
+                for format_variants in variants.values():
+                    for _, variant_name in format_variants:
+                        yield variant_name
+
+
+def get_upload_directories():
+    """Каталоги, в которые загружаются картинки."""
+    return sorted({
+        model._meta.get_field(field).upload_to.strip('/')
+        for model, fields in IMAGE_FIELDS.items() for field in fields
+    })
+
+
+def _run(model, pk, field):
+    try:
+        process(model, pk, field)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать картинку %s %s.%s', model.__name__, pk,
+            field)
+    finally:
+        connections.close_all()
+
+
+def schedule(model, pk, field):
+    """Обработать картинку в фоновом потоке после фиксации транзакции,
+    чтобы поток видел сохраненный объект, а запрос не ждал обработки.
+
+    Задачи, не выполненные до остановки процесса, повторяет команда
+    process_images.
+    """
+    transaction.on_commit(
+        lambda: _executor.submit(_run, model, pk, field))
+
+
+def store_new_images(instance, update_fields=None):
+    """Сохранить новые файлы картинок перед сохранением объекта.
+
+    Файл записывается под хэшем содержимого, как это сделал бы
+    FileField.pre_save. Если у объекта уже сохранена та же картинка
+    (клиент повторно отправил ее при редактировании), варианты остаются
+    прежними. У замененных и удаленных картинок варианты сбрасываются.
+    Возвращает поля, в которых картинка изменилась. Отложенные и не
+    сохраняемые поля не проверяются.
+    """
+    skipped = instance.get_deferred_fields()
+    changed = []
+
+    for field, variants_field in IMAGE_FIELDS[type(instance)].items():
+        if field in skipped or (
+                update_fields is not None and field not in update_fields):
+            continue
+
+        file = getattr(instance, field)
+
+        if file and file._committed:
+            continue
+
+        if file:
+            file.save(file.name, file.file, save=False)
+
+            if not instance._state.adding and type(instance).objects.filter(
+                    pk=instance.pk, **{field: file.name}).exists():
+                continue
+            changed.append(field)
+        setattr(instance, variants_field, {})
+    return changed
@@ -0,0 +1,81 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from api.cache import get_version
+from recipe.models import Ingredient
+
+# Символ больше любого другого: верхняя граница диапазона ключей с префиксом.
+MAX_CHAR = chr(0x10FFFF)
+
+
+class IngredientPrefixIndex:
+    """Индекс названий ингредиентов в памяти процесса для автодополнения.
+
+    Названия в нижнем регистре хранятся отсортированными, поиск по началу
+    названия выполняется бинарным поиском. Вхождения в середине названия
+    ищутся перебором и идут после совпадений с начала, как в
+    ranked_name_search. Индекс перестраивается при первом запросе после
+    смены версии 'ingredient', в остальное время запросы к БД не
+    выполняются. Версия хранится в общем кэше, поэтому индексы всех
+    процессов перестраиваются и после изменений из других процессов и
+    команд, например data_import.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = ()
+        self._ids = array('q')
+        self._names = ()
+        self._units = ()
+
+    def _rebuild(self, version):
+        rows = sorted(
+            (name.lower(), pk, name, unit)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'))
+        self._keys = tuple(row[0] for row in rows)
+        self._ids = array('q', (row[1] for row in rows))
+        self._names = tuple(row[2] for row in rows)
+        self._units = tuple(row[3] for row in rows)
+        self._version = version
+
+    def _ensure_actual(self):
+        version = get_version('ingredient')
+
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._rebuild(version)
+
+    def _sorted_by_length(self, positions):
+        keys = self._keys
+        return sorted(positions, key=lambda i: (len(keys[i]), keys[i]))
+
+    def search(self, value):
+        """Ингредиенты, в названии которых есть value: сначала совпадения
+        с начала названия, затем остальные, внутри групп — более короткие
+        названия. Формат совпадает с IngredientSerializer."""
+        self._ensure_actual()
+        value = value.lower()
+        start = bisect_left(self._keys, value)
+        end = bisect_left(self._keys, value + MAX_CHAR, lo=start)
+        positions = self._sorted_by_length(range(start, end))
+
+        if value:
+            positions += self._sorted_by_length(
+                i for i, key in enumerate(self._keys)
+                if value in key and not (start <= i < end))
+
+        return [
+            {
+                'id': self._ids[i],
+                'name': self._names[i],
+                'measurement_unit': self._units[i],
+            }
+            for i in positions
+        ]
+
+
+ingredient_index = IngredientPrefixIndex()
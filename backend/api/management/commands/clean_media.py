@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from api import media_gc
+from api.constants import MEDIA_GC_GRACE_HOURS
+
+
+class Command(BaseCommand):
+    """Удаление картинок, на которые не ссылаются рецепты и пользователи.
+
+    Файлы остаются после замены картинки, удаления рецепта или аватара и
+    после обработки загрузок. Файлы каталогов загрузки и ссылки из БД
+    читаются по частям, поэтому команда работает в ограниченной памяти и
+    на каталогах с миллионами файлов. Файлы моложе отсрочки не
+    удаляются: ссылки на них могут быть еще не сохранены.
+    """
+
+    help = 'Удаление медиафайлов без ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько файлов и байт будет удалено.')
+        parser.add_argument(
+            '--grace-hours', type=float, default=MEDIA_GC_GRACE_HOURS,
+            help='Не трогать файлы, измененные за это число часов.')
+        parser.add_argument(
+            '--quarantine', metavar='DIR',
+            help='Переносить файлы в каталог DIR вместо удаления.')
+
+    def handle(self, *args, **options):
+        scanned, orphaned, reclaimed = media_gc.collect(
+            options['grace_hours'], options['dry_run'],
+            options['quarantine'])
+
+        if options['dry_run']:
+            action = 'Будет освобождено'
+        elif options['quarantine']:
+            action = 'Перенесено в карантин'
+        else:
+            action = 'Освобождено'
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {scanned}, без ссылок: {orphaned}. '
+            f'{action} байт: {reclaimed}'))
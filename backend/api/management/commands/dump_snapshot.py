@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api import snapshot
+
+
+class Command(BaseCommand):
+    """Выгрузка пользователей, рецептов и связей в каталог снимка.
+
+    Каждая таблица пишется отдельным сжатым CSV, в PostgreSQL — командой
+    COPY, без разбора строк в Python. Снимок загружается командой
+    restore_snapshot. Медиафайлы в снимок не входят.
+    """
+
+    help = 'Выгрузка снимка БД для restore_snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог снимка.')
+
+    def handle(self, *args, **options):
+        tables = snapshot.dump(options['directory'])
+
+        for table in tables:
+            self.stdout.write(f'{table["model"]}: {table["rows"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок сохранен в {options["directory"]}'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api import feed_cache
+
+
+class Command(BaseCommand):
+    """Статистика кэша ленты рецептов для анонимных пользователей.
+
+    Счетчики хранятся в том же кэше, что и страницы ленты, поэтому при
+    общем бэкенде показывают данные всех узлов.
+    """
+
+    help = 'Количество попаданий и промахов кэша ленты рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счетчики после вывода.')
+
+    def handle(self, *args, **options):
+        hits, misses = feed_cache.get_stats()
+        total = hits + misses
+        ratio = hits / total if total else 0
+
+        self.stdout.write(
+            f'Попадания: {hits}, промахи: {misses}, доля попаданий: '
+            f'{ratio:.1%}')
+
+        if options['reset']:
+            feed_cache.reset_stats()
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from api import images
+
+
+class Command(BaseCommand):
+    """Обработка картинок рецептов и аватаров без вариантов.
+
+    Новые картинки обрабатываются в фоновых потоках процесса, который их
+    принял. Команда обрабатывает картинки, загруженные до появления
+    обработки, и задачи, потерянные при остановке процесса. С параметром
+    --all обрабатываются все картинки, например после изменения ширин в
+    IMAGE_VARIANT_WIDTHS.
+    """
+
+    help = 'Создание уменьшенных копий и WebP для картинок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Обработать картинки, у которых уже есть варианты.')
+
+    def handle(self, *args, **options):
+        processed = 0
+        failed = 0
+
+        for model, fields in images.IMAGE_FIELDS.items():
+            for field, variants_field in fields.items():
+                queryset = model.objects.exclude(**{field: ''})
+
+                if not options['all']:
+                    queryset = queryset.filter(**{variants_field: {}})
+
+                for pk in queryset.values_list('pk', flat=True).iterator():
+                    try:
+                        images.process(model, pk, field)
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(
+                            f'{model.__name__} {pk}: {error}')
+                    else:
+                        processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}, с ошибкой: {failed}'))
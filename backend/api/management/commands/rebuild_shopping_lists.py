@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import shopping_list
+
+
+class Command(BaseCommand):
+    """Пересчет сохраненных списков покупок по корзинам.
+
+    Списки обновляются на разницу при изменении корзин и рецептов.
+    Команда исправляет расхождения после пакетных вставок, которые не
+    отправляют сигналы, или ручных изменений в БД. С параметром --check
+    только сравнивает сохраненные суммы с полным пересчетом.
+    """
+
+    help = 'Пересчет списков покупок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, nargs='+',
+            help='Id пользователей. По умолчанию — все пользователи.')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Проверить расхождения без пересчета.')
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+
+        if options['check']:
+            drift = shopping_list.find_drift(user_ids)
+
+            for (user_id, ingredient_id), (stored, expected) in sorted(
+                    drift.items()):
+                self.stdout.write(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'сохранено {stored}, должно быть {expected}')
+
+            if drift:
+                raise CommandError(f'Расхождений: {len(drift)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        with transaction.atomic():
+            created = shopping_list.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Строк списков: {created}'))
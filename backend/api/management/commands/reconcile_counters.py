@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import counters
+
+
+class Command(BaseCommand):
+    """Сверка хранимых счетчиков с данными.
+
+    Счетчики рецептов, подписчиков и добавлений в избранное обновляются
+    при создании и удалении строк. Команда исправляет расхождения после
+    пакетных вставок, которые не отправляют сигналы, или ручных изменений
+    в БД. С параметром --check только выводит количество расхождений.
+    """
+
+    help = 'Сверка счетчиков рецептов, подписчиков и избранного.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Проверить расхождения без исправления.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = counters.find_drift()
+        else:
+            drift = counters.reconcile()
+
+        for name, count in drift.items():
+            self.stdout.write(f'{name}: {count}')
+
+        if options['check'] and any(drift.values()):
+            raise CommandError(
+                f'Расхождений: {sum(drift.values())}')
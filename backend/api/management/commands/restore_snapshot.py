@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api import snapshot
+from api.cache import is_shared
+
+
+class Command(BaseCommand):
+    """Загрузка снимка из dump_snapshot вместо текущих данных.
+
+    Очищаются только таблицы снимка, в том числе токены и группы
+    пользователей. Загрузка идет одной транзакцией: при ошибке данные
+    остаются прежними. Версии данных меняются в общем кэше; кэш в памяти
+    процесса меняется только у самой команды.
+    """
+
+    help = 'Загрузка снимка БД из dump_snapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог снимка.')
+        parser.add_argument(
+            '--no-input', '--noinput', action='store_false',
+            dest='interactive', help='Не запрашивать подтверждение.')
+
+    def handle(self, *args, **options):
+        if options['interactive'] and input(
+                'Текущие пользователи, рецепты и связанные данные будут '
+                'удалены. Введите "yes", чтобы продолжить: ') != 'yes':
+            raise CommandError('Загрузка отменена.')
+
+        try:
+            restored = snapshot.restore(options['directory'])
+        except (OSError, ValueError, IntegrityError) as error:
+            raise CommandError(f'Не удалось загрузить снимок: {error}')
+
+        for model, rows in restored:
+            self.stdout.write(f'{model}: {rows}')
+        self.stdout.write(self.style.SUCCESS('Снимок загружен.'))
+
+        if not is_shared():
+            self.stdout.write(self.style.WARNING(
+                'Кэш хранится в памяти процесса: перезапустите сервер, '
+                'иначе он будет отдавать данные до загрузки снимка.'))
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import shutil
+import time
+from array import array
+from bisect import bisect_left
+
+from django.core.files.storage import default_storage
+
+from api import images
+from api.constants import MEDIA_REFERENCES_CHUNK_SIZE
+
+
+def _key(name):
+    """8-байтовый ключ имени файла. При совпадении ключей файл без ссылок
+    сохраняется, поэтому коллизии безопасны."""
+    return int.from_bytes(
+        hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big',
+        signed=True)
+
+
+class References:
+    """Множество имен файлов со ссылками.
+
+    Имена хранятся 8-байтовыми ключами в отсортированных массивах по
+    MEDIA_REFERENCES_CHUNK_SIZE элементов, поиск — двоичный в каждом
+    массиве. Память — 8 байт на ссылку, при сортировке дополнительно
+    нужна только одна часть.
+    """
+
+    def __init__(self, names):
+        self._chunks = []
+        chunk = array('q')
+
+        for name in names:
+            chunk.append(_key(name))
+
+            if len(chunk) >= MEDIA_REFERENCES_CHUNK_SIZE:
+                self._chunks.append(array('q', sorted(chunk)))
+                chunk = array('q')
+
+        if chunk:
+            self._chunks.append(array('q', sorted(chunk)))
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def __contains__(self, name):
+        key = _key(name)
+
+        for chunk in self._chunks:
+            index = bisect_left(chunk, key)
+
+            if index < len(chunk) and chunk[index] == key:
+                return True
+        return False
+
+
+def iter_files(directory):
+    """Файлы каталога хранилища и подкаталогов: (имя в хранилище, путь,
+    stat). Каталоги читаются через os.scandir по мере обхода, список
+    файлов не накапливается."""
+    root = default_storage.path('')
+    stack = [default_storage.path(directory)]
+
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, root)
+                    yield (
+                        name.replace(os.sep, '/'), entry.path,
+                        entry.stat(follow_symlinks=False))
+
+
+def _quarantine(path, name, quarantine):
+    target = os.path.join(quarantine, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(path, target)
+
+
+def collect(grace_hours, dry_run=False, quarantine=None):
+    """Удалить или перенести в каталог quarantine файлы каталогов загрузки
+    картинок, на которые нет ссылок и которые не менялись дольше
+    grace_hours часов.
+
+    Ссылки читаются до обхода файлов. Отсрочка защищает файлы, ссылки на
+    которые сохраняются после этого: хранилище обновляет время изменения
+    файла и при повторной загрузке того же содержимого. Возвращает
+    (проверено файлов, файлов без ссылок, байт).
+    """
+    references = References(images.iter_referenced_names())
+    deadline = time.time() - grace_hours * 60 * 60
+    scanned = orphaned = reclaimed = 0
+
+    for directory in images.get_upload_directories():
+        for name, path, stat in iter_files(directory):
+            scanned += 1
+
+            if stat.st_mtime > deadline or name in references:
+                continue
+
+            orphaned += 1
+            reclaimed += stat.st_size
+
+            if dry_run:
+                continue
+
+            if quarantine:
+                _quarantine(path, name, quarantine)
+            else:
+                os.remove(path)
+
+    return scanned, orphaned, reclaimed
@@ -0,0 +1,62 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from api.cache import get_last_modified, get_versions, is_shared
+
+
+class ConditionalGetMixin:
+    """Ответ 304 Not Modified на условные GET запросы до сериализации.
+
+    Валидаторы ETag и Last-Modified строятся из версий данных, которые
+    возвращает get_validator_versions() для action из conditional_actions.
+    Если метод возвращает None, запрос обрабатывается как обычно. Так же
+    обрабатываются все запросы, если версии хранятся в памяти процесса:
+    валидаторы разных процессов не совпадали бы, а изменения из других
+    процессов их не меняли бы.
+    vary_on_authorization указывает, что ответ зависит от пользователя.
+    """
+    conditional_actions = ['list', 'retrieve']
+    validator_versions = []
+    vary_on_authorization = False
+
+    def get_validator_versions(self):
+        return self.validator_versions
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        names = None
+
+        if is_shared() and self.action in self.conditional_actions:
+            names = self.get_validator_versions()
+
+        if names is None:
+            return handler(request, *args, **kwargs)
+
+        versions = ':'.join(str(version) for version in get_versions(names))
+        etag = quote_etag(hashlib.md5(
+            f'{request.get_full_path()}:{names}:{versions}'.encode(),
+            usedforsecurity=False
+        ).hexdigest())
+        last_modified = get_last_modified(names)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+
+            if self.vary_on_authorization:
+                patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
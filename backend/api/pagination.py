@@ -1,7 +1,208 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import hashlib
+import json
+from functools import cached_property, partial
 
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (
+    LimitOffsetPagination, PageNumberPagination,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-class RecipePagination(PageNumberPagination):
-    """Названия ключей пагинации."""
+from api.cache import get_version
+from api.constants import (
+    COUNT_CACHE_TIMEOUT, COUNT_CACHED, COUNT_ESTIMATE,
+    COUNT_ESTIMATE_THRESHOLD, COUNT_EXACT, KEYSET_ORDERING,
+)
+
+
+def estimate_count(queryset):
+    """Оценка количества строк планировщиком PostgreSQL. Для других БД
+    возвращает None."""
+    connection = connections[queryset.db]
+
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class CountStrategyMixin:
+    """Подсчет общего количества объектов способом, указанным в
+    представлении:
+
+    count_strategy — COUNT_EXACT, COUNT_CACHED или COUNT_ESTIMATE;
+    count_versions — версии данных, при смене которых кэш сбрасывается;
+    exact_count_params — параметры запроса, сужающие выборку до данных
+    пользователя, при них всегда выполняется точный подсчет.
+    """
+
+    def count_queryset(self, queryset, request, view):
+        strategy = getattr(view, 'count_strategy', COUNT_EXACT)
+        exact_params = getattr(view, 'exact_count_params', [])
+
+        if any(request.query_params.get(param) for param in exact_params):
+            strategy = COUNT_EXACT
+
+        if strategy == COUNT_ESTIMATE:
+            estimate = estimate_count(queryset)
+
+            if estimate is not None and estimate >= COUNT_ESTIMATE_THRESHOLD:
+                return estimate
+
+        if strategy == COUNT_CACHED:
+            return self._cached_count(queryset, view)
+
+        return queryset.count()
+
+    def _cached_count(self, queryset, view):
+        # В ключ входят только условия выборки: аннотации с флагами
+        # пользователя не меняют количество и не должны дробить кэш.
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        versions = [
+            str(get_version(name))
+            for name in getattr(view, 'count_versions', [])]
+        digest = hashlib.md5(
+            repr((sql, params)).encode(), usedforsecurity=False
+        ).hexdigest()
+        key = f'count:{":".join(versions)}:{digest}'
+        count = cache.get(key)
+
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CountStrategyPaginator(Paginator):
+    """Paginator с подсчетом количества через переданную функцию."""
+
+    def __init__(self, *args, count_func, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_func = count_func
+
+    @cached_property
+    def count(self):
+        return self.count_func(self.object_list)
+
+
+class UserPagination(CountStrategyMixin, LimitOffsetPagination):
+    """Пагинация limit/offset с выбором способа подсчета количества."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        return self.count_queryset(queryset, self.request, self.view)
+
+
+class RecipePagination(CountStrategyMixin, PageNumberPagination):
+    """Названия ключей пагинации.
+
+    Если в запросе передан параметр cursor (для первой страницы — пустой),
+    используется пагинация по ключу (pub_date, id): без COUNT и OFFSET,
+    время ответа не зависит от номера страницы. Без него работают
+    параметры page и limit. Курсор не сочетается с другим порядком, например
+    по релевантности поиска: такие запросы отклоняются с ошибкой 400.
+    """
     page_size_query_param = 'limit'
     page_query_param = 'page'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+    unsupported_ordering_message = (
+        'Курсор нельзя использовать с поиском: результаты упорядочены по '
+        'релевантности. Используйте параметры page и limit.')
+
+    def _is_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self._is_keyset(request)
+
+        if not self.keyset:
+            self.django_paginator_class = partial(
+                CountStrategyPaginator,
+                count_func=partial(
+                    self.count_queryset, request=request, view=view))
+            return super().paginate_queryset(queryset, request, view)
+
+        ordering = list(queryset.query.order_by)
+
+        if ordering and ordering != KEYSET_ORDERING:
+            raise ValidationError(
+                {self.cursor_query_param: self.unsupported_ordering_message})
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self._decode_cursor(request)
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                pub_date__lte=pub_date
+            ).exclude(
+                pub_date=pub_date, id__gte=pk
+            )
+
+        # Лишняя строка показывает, есть ли следующая страница.
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return Response({
+            'next': self._get_next_cursor_link(),
+            'results': data,
+        })
+
+    def _get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        cursor = base64.urlsafe_b64encode(
+            f'{last.pub_date.isoformat()}|{last.id}'.encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _decode_cursor(self, request):
+        """Позиция (pub_date, id) последнего рецепта предыдущей страницы."""
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        if not cursor:
+            return None
+
+        try:
+            pub_date, pk = base64.urlsafe_b64decode(
+                cursor.encode()).decode().split('|')
+            position = parse_datetime(pub_date), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
@@ -0,0 +1,98 @@
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Value
+
+from api.constants import RELATION_CACHE_TIMEOUT
+from user.models import Favorite, ShoppingCart, Subscription
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+FOLLOWS = 'follows'
+
+RELATION_KEY = 'relation-ids:{}:{}'
+
+# Вид связи: (модель, поле с id связанного объекта).
+RELATIONS = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    FOLLOWS: (Subscription, 'follow_id'),
+}
+RELATION_KINDS = {model: kind for kind, (model, _) in RELATIONS.items()}
+
+
+def _encode(ids):
+    return array('q', sorted(ids)).tobytes()
+
+
+def _decode(data):
+    ids = array('q')
+    ids.frombytes(data)
+    return frozenset(ids)
+
+
+def _load(user_id, kinds):
+    """Загрузка множеств из БД одним запросом для всех видов связей."""
+    querysets = [
+        RELATIONS[kind][0].objects.filter(user_id=user_id).annotate(
+            kind=Value(kind, output_field=CharField())
+        ).values_list('kind', RELATIONS[kind][1])
+        for kind in kinds
+    ]
+    result = {kind: set() for kind in kinds}
+
+    for kind, pk in querysets[0].union(*querysets[1:], all=True):
+        result[kind].add(pk)
+    return {kind: frozenset(ids) for kind, ids in result.items()}
+
+
+def get_relation_ids(user_id, kinds):
+    """Id рецептов в избранном и корзине и id авторов в подписках
+    пользователя по видам связей.
+
+    Множества хранятся в кэше массивом 8-байтовых чисел и читаются одним
+    запросом к кэшу. Отсутствующие в кэше множества загружаются из БД.
+    """
+    keys = {kind: RELATION_KEY.format(kind, user_id) for kind in kinds}
+    cached = cache.get_many(keys.values())
+    result = {
+        kind: _decode(cached[key])
+        for kind, key in keys.items() if key in cached
+    }
+    missing = [kind for kind in kinds if kind not in result]
+
+    if missing:
+        loaded = _load(user_id, missing)
+        cache.set_many({
+            keys[kind]: _encode(ids) for kind, ids in loaded.items()
+        }, RELATION_CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def get_ids(user_id, kind):
+    return get_relation_ids(user_id, [kind])[kind]
+
+
+def invalidate_relation(instance):
+    """Удаление множества связей пользователя из кэша при изменении
+    связи instance. Множество загружается из БД при следующем чтении.
+
+    Ключ удаляется сразу и еще раз после фиксации транзакции: запрос,
+    прочитавший множество до фиксации, мог вернуть в кэш старые данные.
+    Изменение множества на месте не подходит: параллельные запросы
+    перезаписали бы изменения друг друга.
+    """
+    key = RELATION_KEY.format(
+        RELATION_KINDS[type(instance)], instance.user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def forget_users(user_ids):
+    """Удаление из кэша всех множеств связей пользователей user_ids."""
+    cache.delete_many([
+        RELATION_KEY.format(kind, user_id)
+        for user_id in user_ids for kind in RELATIONS
+    ])
@@ -0,0 +1,50 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Length
+
+from recipe.constants import SEARCH_CONFIG
+
+
+def ranked_name_search(queryset, value, ordering):
+    """Поиск по вхождению строки в название.
+
+    Сначала идут названия, которые начинаются со строки, затем остальные
+    совпадения, внутри групп — более короткие названия. Условие поиска
+    (UPPER(name) LIKE '%...%') обслуживается триграммным GIN индексом на
+    UPPER(name), поэтому выборка выполняется одним запросом по индексу.
+    """
+    value = value.strip()
+
+    if not value:
+        return queryset
+
+    return queryset.filter(
+        name__icontains=value
+    ).annotate(
+        search_rank=Case(
+            When(name__istartswith=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()),
+        search_length=Length('name'),
+    ).order_by('search_rank', 'search_length', *ordering)
+
+
+def full_text_search(queryset, value, ordering):
+    """Полнотекстовый поиск по названию и описанию рецепта.
+
+    Условие проверяется по поддерживаемому БД столбцу search_vector с GIN
+    индексом, результаты упорядочены по релевантности: совпадения в
+    названии весят больше, чем в описании.
+    """
+    value = value.strip()
+
+    if not value:
+        return queryset
+
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+
+    return queryset.filter(
+        search_vector=query
+    ).annotate(
+        search_rank=SearchRank(F('search_vector'), query),
+    ).order_by('-search_rank', *ordering)
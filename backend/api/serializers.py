@@ -1,18 +1,31 @@
-import base64
-import uuid
+import binascii
+from io import BytesIO
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import (
+    InMemoryUploadedFile, TemporaryUploadedFile, UploadedFile,
+)
+from django.db import transaction
 from djoser.serializers import (
     TokenCreateSerializer as DjoserTokenCreateSerializer,
     UserCreateSerializer as DjoserUserCreateSerializer,
     UserSerializer as DjoserUserSerialiser,
 )
+from PIL import Image
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.constants import REQUERED_RECIPE_FIELDS
+from api import shopping_list
+from api.constants import (
+    BASE64_CHUNK_SIZE, IMAGE_MAX_BYTES, IMAGE_MAX_PIXELS,
+    REQUERED_RECIPE_FIELDS,
+)
+from api.relations import (
+    FAVORITES, FOLLOWS, SHOPPING_CART, get_ids, get_relation_ids,
+)
 from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag
 from user.models import Favorite, ShoppingCart, Subscription
 
@@ -20,18 +33,113 @@ User = get_user_model()
 
 
 class Base64ImageField(serializers.ImageField):
-    """Поле для base64 картинок."""
+    """Поле для картинок в base64 или файлом multipart/form-data.
+
+    Строка base64 декодируется частями: небольшие картинки в память,
+    большие во временный файл, как это делают обработчики загрузки
+    Django. Размер файла и число пикселей проверяются до декодирования
+    самой картинки.
+    """
+    default_error_messages = {
+        'invalid_base64': 'Некорректная строка base64.',
+        'too_large': 'Размер файла больше {max_size} байт.',
+        'too_many_pixels': 'Картинка больше {max_pixels} пикселей.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            id = uuid.uuid4()
-            file_name = f'{id}.{ext}'
-            data = ContentFile(base64.b64decode(imgstr), name=file_name)
+            data = self._decode(data)
 
+        if isinstance(data, UploadedFile):
+            self._check_limits(data)
         return super().to_internal_value(data)
 
+    def _decode(self, data):
+        """Декодирование строки base64 частями, кратными 4 символам, без
+        копий всей строки."""
+        header_end = data.find(';base64,')
+
+        if header_end == -1:
+            self.fail('invalid_base64')
+
+        start = header_end + len(';base64,')
+        size = (len(data) - start) * 3 // 4
+
+        if size > IMAGE_MAX_BYTES:
+            self.fail('too_large', max_size=IMAGE_MAX_BYTES)
+
+        content_type = data[len('data:'):header_end]
+        # Имя файла в хранилище задает хэш содержимого.
+        name = f'image.{content_type.split("/")[-1]}'
+
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = TemporaryUploadedFile(name, content_type, size, None)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, size, None)
+
+        try:
+            for position in range(start, len(data), BASE64_CHUNK_SIZE):
+                file.write(binascii.a2b_base64(
+                    data[position:position + BASE64_CHUNK_SIZE]))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
+    def _check_limits(self, file):
+        """Проверка размера файла и размеров картинки по заголовку.
+        Ошибки формата сообщает проверка ImageField."""
+        if file.size > IMAGE_MAX_BYTES:
+            self.fail('too_large', max_size=IMAGE_MAX_BYTES)
+
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_pixels=IMAGE_MAX_PIXELS)
+        except (OSError, ValueError):
+            return
+        finally:
+            file.seek(0)
+
+        if width * height > IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels', max_pixels=IMAGE_MAX_PIXELS)
+
+
+class SrcsetField(serializers.ReadOnlyField):
+    """Варианты картинки в формате атрибута srcset по форматам файлов:
+    {"webp": "<url> 320w, <url> 640w", ...}. Пока картинка не
+    обработана, вариантов нет."""
+    def to_representation(self, value):
+        request = self.context.get('request')
+        result = {}
+
+        for format, variants in value.items():
+            urls = []
+
+            for width, name in variants:
+                url = default_storage.url(name)
+
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls.append(f'{url} {width}w')
+            result[format] = ', '.join(urls)
+        return result
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не указан или
+    указан неверно."""
+    recipes_limit = request.query_params.get('recipes_limit')
+
+    if recipes_limit is not None and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
 
 # --- СЕРИАЛИЗАТОРЫ ПОЛЬЗОВАТЕЛЕЙ ---
 
@@ -39,19 +147,36 @@ class UserSerializer(DjoserUserSerialiser):
     """Сериализатор пользователя с нужными для проекта полями."""
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField()
+    avatar_srcset = SrcsetField(source='avatar_variants')
+
+    def _get_followed_ids(self, user):
+        """Id авторов, на которых подписан пользователь. Берутся из кэша
+        связей один раз на запрос и хранятся в общем контексте корневого
+        сериализатора, поэтому вложенные сериализаторы не обращаются к кэшу
+        на каждую строку."""
+        context = self.context
+
+        if 'followed_ids' not in context:
+            context['followed_ids'] = get_ids(user.id, FOLLOWS)
+        return context['followed_ids']
 
     def get_is_subscribed(self, obj):
+        """Если флаг уже известен представлению, он передается аннотацией
+        is_subscribed."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         request = self.context.get('request')
 
-        if request.user.is_anonymous:
+        if request is None or request.user.is_anonymous:
             return False
-        return obj.follows.filter(user=request.user).exists()
+        return obj.id in self._get_followed_ids(request.user)
 
     class Meta:
         model = User
         fields = [
             'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'avatar']
+            'is_subscribed', 'avatar', 'avatar_srcset']
 
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
@@ -84,10 +209,11 @@ class TokenCreateSerializer(DjoserTokenCreateSerializer):
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для просмотра аватара пользователя."""
     avatar = Base64ImageField()
+    avatar_srcset = SrcsetField(source='avatar_variants')
 
     class Meta:
         model = User
-        fields = ['avatar']
+        fields = ['avatar', 'avatar_srcset']
 
 
 class ShoppingCartWriteSerializer(serializers.ModelSerializer):
@@ -125,10 +251,21 @@ class FavoriteWriteSerializer(serializers.ModelSerializer):
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Короткий вариант сериализатора рецептов."""
     image = Base64ImageField()
+    image_srcset = SrcsetField(source='image_variants')
+
+    class Meta:
+        model = Recipe
+        fields = ['id', 'name', 'image', 'image_srcset', 'cooking_time']
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Сериализатор для замены картинки рецепта."""
+    image = Base64ImageField()
+    image_srcset = SrcsetField(source='image_variants')
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['image', 'image_srcset']
 
 
 class SubscriptionReadSerializer(UserSerializer):
@@ -136,15 +273,16 @@ class SubscriptionReadSerializer(UserSerializer):
     recipes_count = serializers.ReadOnlyField()
 
     def get_recipes(self, obj):
-        """Применить recipes_limit, если он указан в запросе."""
-        recipes = obj.recipes.all()
-        recipes_limit = self.context['request'].query_params.get(
-            'recipes_limit')
-
-        if recipes_limit is not None and recipes_limit.isdigit():
-            recipes_limit = int(recipes_limit)
-
-            if recipes_limit >= 0:
+        """Применить recipes_limit, если он указан в запросе. Если
+        представление уже загрузило рецепты автора с учетом лимита, они
+        берутся из атрибута latest_recipes."""
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context['request'])
+
+            if recipes_limit is not None:
                 recipes = recipes[:recipes_limit]
 
         return RecipeShortSerializer(
@@ -157,7 +295,8 @@ class SubscriptionReadSerializer(UserSerializer):
         model = User
         fields = [
             'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'recipes', 'recipes_count', 'avatar']
+            'is_subscribed', 'recipes', 'recipes_count', 'avatar',
+            'avatar_srcset']
 
 
 class SubscriptionWriteSerializer(serializers.ModelSerializer):
@@ -228,6 +367,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_srcset = SrcsetField(source='image_variants')
     cooking_time = serializers.IntegerField(min_value=1)
 
     def _recipe_ingredient_create(self, recipe_ingredients, recipe):
@@ -256,15 +396,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     def update(self, instance, validated_data):
-        """Обновление объекта из данных вложенных сериализаторов."""
+        """Обновление объекта из данных вложенных сериализаторов. Рецепт,
+        теги, ингредиенты и списки покупок меняются в одной транзакции."""
         tags = validated_data.pop('tags')
         recipe_ingredients = validated_data.pop('recipe_ingredients')
 
-        instance.tags.set(tags)
-        instance.recipe_ingredients.all().delete()
-        self._recipe_ingredient_create(recipe_ingredients, instance)
+        with transaction.atomic():
+            instance.tags.set(tags)
 
-        return super().update(instance, validated_data)
+            with shopping_list.recipe_ingredients_replaced(instance.id):
+                instance.recipe_ingredients.all().delete()
+                self._recipe_ingredient_create(recipe_ingredients, instance)
+
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         """Добавить поле tags в ответ."""
@@ -307,29 +451,38 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return super().validate(attrs)
 
-    def _is_user_has_relation(self, obj, related_model):
-        """Поиск связей пользователя в моделях."""
+    def _is_user_has_relation(self, obj, kind, annotation):
+        """Поиск рецепта в связях пользователя. Если флаг уже посчитан
+        аннотацией в queryset представления, он используется как есть,
+        иначе проверяется множество id из кэша связей. Множества читаются
+        один раз на запрос и хранятся в контексте."""
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+
         request = self.context.get('request')
 
-        if request and request.user.is_authenticated:
-            return related_model.objects.filter(
-                user=request.user,
-                recipe=obj
-            ).exists()
-        return False
+        if request is None or not request.user.is_authenticated:
+            return False
+
+        if 'relation_ids' not in self.context:
+            self.context['relation_ids'] = get_relation_ids(
+                request.user.id, [FAVORITES, SHOPPING_CART])
+        return obj.id in self.context['relation_ids'][kind]
 
     def get_is_favorited(self, obj):
         """Получение значения is_favorited."""
-        return self._is_user_has_relation(obj, Favorite)
+        return self._is_user_has_relation(obj, FAVORITES, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
         """Получение значения is_in_shopping_cart."""
-        return self._is_user_has_relation(obj, ShoppingCart)
+        return self._is_user_has_relation(
+            obj, SHOPPING_CART, 'is_in_shopping_cart')
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time']
+            'is_in_shopping_cart', 'name', 'image', 'image_srcset', 'text',
+            'cooking_time']
         read_only_fields = [
             'id', 'is_favorited', 'is_in_shopping_cart']
@@ -0,0 +1,270 @@
+import csv
+import json
+import threading
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from api.constants import SHOPPING_LIST_CHUNK_SIZE
+from recipe.models import Recipe, RecipeIngredient
+from user.models import ShoppingCart, ShoppingListItem
+
+_suspended = threading.local()
+
+
+def get_shopping_list(user):
+    """Суммы ингредиентов из корзины пользователя. Читаются готовые
+    строки ShoppingListItem, стоимость зависит только от числа разных
+    ингредиентов."""
+    return ShoppingListItem.objects.filter(
+        user=user, amount__gt=0
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+def aggregate_shopping_lists(user_ids=None):
+    """Полный пересчет сумм по корзинам: (id пользователя, id
+    ингредиента, сумма).
+
+    Один GROUP BY по RecipeIngredient, соединенному со строками корзины.
+    Пара (пользователь, рецепт) в корзине уникальна, поэтому каждая
+    строка рецепта учитывается один раз для каждого пользователя.
+    """
+    filters = {'recipe__shopping_cart__isnull': False}
+
+    if user_ids is not None:
+        filters = {'recipe__shopping_cart__user_id__in': user_ids}
+
+    return RecipeIngredient.objects.filter(
+        **filters
+    ).values(
+        'recipe__shopping_cart__user_id', 'ingredient_id'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by().values_list(
+        'recipe__shopping_cart__user_id', 'ingredient_id', 'total_amount')
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _add_amounts(select_sql, params):
+    """Прибавить к строкам списков суммы из select_sql, который выбирает
+    (user_id, ingredient_id, amount). Отсутствующие строки создаются.
+
+    В select_sql должно быть условие WHERE: без него SQLite не разбирает
+    INSERT ... SELECT ... ON CONFLICT.
+    """
+    items = _table(ShoppingListItem)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {items} (user_id, ingredient_id, amount) '
+            f'{select_sql} '
+            f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+            f'SET amount = {items}.amount + EXCLUDED.amount',
+            params)
+
+
+def _delete_empty(**filters):
+    ShoppingListItem.objects.filter(amount__lte=0, **filters).delete()
+
+
+def _lock_recipe(recipe_id):
+    """Блокировка строки рецепта до конца транзакции.
+
+    Изменения корзины и ингредиентов одного рецепта выполняются по
+    очереди. Иначе замена ингредиентов не увидела бы строку корзины из
+    незафиксированной транзакции, а добавление в корзину прочитало бы
+    старые ингредиенты: список разошелся бы с пересчетом. Строка корзины
+    или ингредиента должна быть изменена в той же транзакции до
+    блокировки.
+    """
+    list(Recipe.objects.select_for_update(no_key=True).filter(
+        pk=recipe_id).order_by().values_list('pk', flat=True))
+
+
+def _apply_cart_recipe(user_id, recipe_id, sign):
+    with transaction.atomic():
+        _lock_recipe(recipe_id)
+        _add_amounts(
+            f'SELECT %s, ingredient_id, %s * amount '
+            f'FROM {_table(RecipeIngredient)} WHERE recipe_id = %s',
+            [user_id, sign, recipe_id])
+
+        if sign < 0:
+            _delete_empty(user_id=user_id)
+
+
+def cart_recipe_added(user_id, recipe_id):
+    """Добавить к списку пользователя ингредиенты рецепта из корзины.
+    Строка корзины должна быть создана в текущей транзакции."""
+    _apply_cart_recipe(user_id, recipe_id, 1)
+
+
+def cart_recipe_removed(user_id, recipe_id):
+    _apply_cart_recipe(user_id, recipe_id, -1)
+
+
+def recipe_ingredient_changed(recipe_id, ingredient_id, delta):
+    """Изменить на delta количество ингредиента у всех пользователей, у
+    которых рецепт в корзине."""
+    with transaction.atomic():
+        _lock_recipe(recipe_id)
+        _add_amounts(
+            f'SELECT user_id, %s, %s FROM {_table(ShoppingCart)} '
+            f'WHERE recipe_id = %s',
+            [ingredient_id, delta, recipe_id])
+
+        if delta < 0:
+            _delete_empty(ingredient_id=ingredient_id)
+
+
+def _apply_recipe(recipe_id, sign):
+    """Прибавить (sign=1) или вычесть (sign=-1) все ингредиенты рецепта в
+    списках пользователей, у которых он в корзине."""
+    cart = _table(ShoppingCart)
+    recipe_ingredients = _table(RecipeIngredient)
+
+    _add_amounts(
+        f'SELECT c.user_id, ri.ingredient_id, %s * ri.amount '
+        f'FROM {cart} c JOIN {recipe_ingredients} ri '
+        f'ON ri.recipe_id = c.recipe_id WHERE c.recipe_id = %s',
+        [sign, recipe_id])
+
+
+def recipe_removed(recipe_id):
+    """Вычесть ингредиенты рецепта перед его удалением."""
+    with transaction.atomic():
+        _lock_recipe(recipe_id)
+        _apply_recipe(recipe_id, -1)
+        _delete_empty(user__shopping_cart__recipe_id=recipe_id)
+
+
+def is_suspended(recipe_id):
+    """Изменения ингредиентов рецепта учитываются целиком, обработка
+    отдельных строк не нужна."""
+    return getattr(_suspended, 'recipe_id', None) == recipe_id
+
+
+@contextmanager
+def recipe_ingredients_replaced(recipe_id):
+    """Замена ингредиентов рецепта: списки обновляются тремя запросами
+    вместо запросов на каждую удаленную и созданную строку.
+
+    Все выполняется в одной транзакции с заблокированной строкой рецепта:
+    ингредиенты вычитаются до замены и прибавляются после нее, при ошибке
+    транзакция откатывается вместе с заменой.
+    """
+    with transaction.atomic():
+        _lock_recipe(recipe_id)
+        _apply_recipe(recipe_id, -1)
+        _suspended.recipe_id = recipe_id
+
+        try:
+            yield
+        finally:
+            _suspended.recipe_id = None
+
+        _apply_recipe(recipe_id, 1)
+        _delete_empty(user__shopping_cart__recipe_id=recipe_id)
+
+
+def rebuild(user_ids=None):
+    """Пересчитать списки пользователей user_ids или всех пользователей.
+    Возвращает количество созданных строк."""
+    items = ShoppingListItem.objects.all()
+
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+
+    items.delete()
+    created = 0
+    batch = []
+
+    for user_id, ingredient_id, amount in aggregate_shopping_lists(
+            user_ids).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE):
+        batch.append(ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, amount=amount))
+
+        if len(batch) >= SHOPPING_LIST_CHUNK_SIZE:
+            created += len(ShoppingListItem.objects.bulk_create(batch))
+            batch = []
+
+    if batch:
+        created += len(ShoppingListItem.objects.bulk_create(batch))
+    return created
+
+
+def find_drift(user_ids=None):
+    """Строки, в которых сохраненные суммы расходятся с полным пересчетом:
+    {(id пользователя, id ингредиента): (сохранено, пересчитано)}."""
+    items = ShoppingListItem.objects.filter(amount__gt=0)
+
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in items.values_list(
+            'user_id', 'ingredient_id', 'amount')}
+    expected = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in aggregate_shopping_lists(
+            user_ids)}
+
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in stored.keys() | expected.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+def render_txt(rows):
+    yield 'Список ингредиентов:\n'
+
+    for name, measurement_unit, amount in rows:
+        yield f'{name.capitalize()}: {amount} {measurement_unit}\n'
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['name', 'measurement_unit', 'amount'])
+
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_json(rows):
+    separator = ''
+    yield '['
+
+    for name, measurement_unit, amount in rows:
+        item = json.dumps({
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        }, ensure_ascii=False)
+        yield f'{separator}{item}'
+        separator = ','
+    yield ']'
+
+
+# Формат: (тип содержимого, функция вывода).
+FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'json': ('application/json', render_json),
+}
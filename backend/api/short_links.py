@@ -0,0 +1,95 @@
+import string
+
+from django.core.cache import cache
+
+from api.cache import get_version
+from api.constants import (
+    SHORT_LINK_CACHE_TIMEOUT, SHORT_LINK_CODE_LENGTH, SHORT_LINK_MULTIPLIER,
+    SHORT_LINK_OFFSET,
+)
+from recipe.models import Recipe, ShortLink
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+MODULUS = BASE ** SHORT_LINK_CODE_LENGTH
+INVERSE = pow(SHORT_LINK_MULTIPLIER, -1, MODULUS)
+
+SHORT_LINK_KEY = 'short-link:{}:{}'
+
+
+def get_short_code(recipe_id):
+    """Короткий код рецепта из его id без обращения к БД.
+
+    Id перемешивается обратимым преобразованием (id *
+    SHORT_LINK_MULTIPLIER + SHORT_LINK_OFFSET) mod 62^n и записывается в
+    base62 ровно n символами. Затем разряды складываются с соседними в
+    обоих направлениях, чтобы у соседних id различались все символы.
+    Все шаги обратимы, поэтому коды разных рецептов не совпадают.
+    """
+    value = (recipe_id * SHORT_LINK_MULTIPLIER + SHORT_LINK_OFFSET) % MODULUS
+    digits = []
+
+    for _ in range(SHORT_LINK_CODE_LENGTH):
+        value, digit = divmod(value, BASE)
+        digits.append(digit)
+
+    for index in range(1, len(digits)):
+        digits[index] = (digits[index] + digits[index - 1]) % BASE
+
+    for index in reversed(range(len(digits) - 1)):
+        digits[index] = (digits[index] + digits[index + 1]) % BASE
+    return ''.join(ALPHABET[digit] for digit in digits)
+
+
+def _decode(short_code):
+    """Id рецепта по коду из get_short_code или None, если код другого
+    вида."""
+    if len(short_code) != SHORT_LINK_CODE_LENGTH or any(
+            char not in ALPHABET for char in short_code):
+        return None
+
+    digits = [ALPHABET.index(char) for char in short_code]
+
+    for index in range(len(digits) - 1):
+        digits[index] = (digits[index] - digits[index + 1]) % BASE
+
+    for index in reversed(range(1, len(digits))):
+        digits[index] = (digits[index] - digits[index - 1]) % BASE
+
+    value = sum(digit * BASE ** index for index, digit in enumerate(digits))
+    return (value - SHORT_LINK_OFFSET) * INVERSE % MODULUS
+
+
+def _find_recipe_id(short_code):
+    """Id существующего рецепта по коду из БД или None. Строки ShortLink
+    удаляются вместе с рецептом, поэтому для старых кодов отдельная
+    проверка не нужна."""
+    recipe_id = _decode(short_code)
+
+    if recipe_id is None:
+        return ShortLink.objects.filter(
+            short_code=short_code
+        ).values_list('recipe_id', flat=True).first()
+
+    if Recipe.objects.filter(pk=recipe_id).exists():
+        return recipe_id
+    return None
+
+
+def get_recipe_id(short_code):
+    """Id существующего рецепта по короткому коду или None.
+
+    Коды из id декодируются без запросов к БД, старые случайные коды
+    другой длины ищутся в таблице ShortLink. Любой код нужной длины
+    декодируется в какое-то число, поэтому наличие рецепта проверяется
+    по БД. Результат хранится в общем кэше с версией рецептов в ключе:
+    после создания или удаления рецепта он проверяется заново всеми
+    процессами.
+    """
+    key = SHORT_LINK_KEY.format(get_version('recipe'), short_code)
+    recipe_id = cache.get(key)
+
+    if recipe_id is None:
+        recipe_id = _find_recipe_id(short_code) or 0
+        cache.set(key, recipe_id, SHORT_LINK_CACHE_TIMEOUT)
+    return recipe_id or None
@@ -0,0 +1,226 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from api import counters, images, shopping_list
+from api.cache import bump_version
+from api.constants import FEED_USER_FIELDS
+from api.relations import invalidate_relation
+from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag
+from user.models import Favorite, ShoppingCart, Subscription
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_version('recipe', f'recipe:{instance.pk}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            bump_version('recipe', f'recipe:{instance.pk}')
+        return
+
+    # Изменение рецептов со стороны тега: при очистке id рецептов
+    # известны только до удаления связей.
+    if action == 'pre_clear':
+        pk_set = instance.recipes.values_list('id', flat=True)
+    elif action not in ('post_add', 'post_remove'):
+        return
+    bump_version('recipe', *(f'recipe:{pk}' for pk in pk_set))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_version('recipe', f'recipe:{instance.recipe_id}')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version('tag', 'recipe')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version('ingredient')
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    bump_version('user', f'user:{instance.pk}')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields, **kwargs):
+    """Запомнить, меняются ли поля автора, которые выводятся в ленте.
+    Вход, смена пароля и новые пользователи не сбрасывают кэш ленты."""
+    instance._feed_fields_changed = False
+
+    if instance._state.adding:
+        return
+
+    fields = [
+        field for field in FEED_USER_FIELDS
+        if update_fields is None or field in update_fields]
+
+    if not fields:
+        return
+
+    previous = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._feed_fields_changed = previous is None or any(
+        getattr(instance, field) != previous[field] for field in fields)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    if instance._feed_fields_changed:
+        bump_version('user', f'user:{instance.pk}')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def user_relation_saved(sender, instance, created, **kwargs):
+    """Версия и множества id связей пользователя: избранное, корзина и
+    подписки."""
+    bump_version(f'relations:{instance.user_id}')
+
+    if created:
+        invalidate_relation(instance)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def user_relation_deleted(sender, instance, **kwargs):
+    bump_version(f'relations:{instance.user_id}')
+    invalidate_relation(instance)
+
+
+def _is_cascade_from(origin, *models):
+    """Удаление вызвано удалением объекта или queryset одной из моделей."""
+    if isinstance(origin, QuerySet):
+        return origin.model in models
+    return isinstance(origin, models)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    """Ингредиенты удаляемого рецепта вычитаются из списков покупок сразу,
+    каскадное удаление строк корзины и ингредиентов их не трогает."""
+    shopping_list.recipe_removed(instance.pk)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_saved(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.cart_recipe_added(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, origin=None, **kwargs):
+    # Списки удаляемого пользователя удаляются каскадом.
+    if not _is_cascade_from(origin, Recipe, User):
+        shopping_list.cart_recipe_removed(
+            instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def recipe_ingredient_saving(sender, instance, **kwargs):
+    """Запомнить прежние ингредиент и количество для расчета разницы."""
+    instance._shopping_list_previous = None
+
+    if instance.pk and not shopping_list.is_suspended(instance.recipe_id):
+        instance._shopping_list_previous = RecipeIngredient.objects.filter(
+            pk=instance.pk).values_list('ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    if shopping_list.is_suspended(instance.recipe_id):
+        return
+
+    previous = instance._shopping_list_previous
+
+    if previous is not None:
+        shopping_list.recipe_ingredient_changed(
+            instance.recipe_id, previous[0], -previous[1])
+    shopping_list.recipe_ingredient_changed(
+        instance.recipe_id, instance.ingredient_id, instance.amount)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_deleted(sender, instance, origin=None, **kwargs):
+    # Строки списков удаляемого ингредиента удаляются каскадом.
+    if shopping_list.is_suspended(instance.recipe_id) or _is_cascade_from(
+            origin, Recipe, Ingredient):
+        return
+    shopping_list.recipe_ingredient_changed(
+        instance.recipe_id, instance.ingredient_id, -instance.amount)
+
+
+def _is_deleted_with(origin, model, pk):
+    """Удаление вызвано удалением объекта model с первичным ключом pk:
+    его счетчик обновлять не нужно."""
+    return isinstance(origin, model) and origin.pk == pk
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.change(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_uncounted(sender, instance, origin=None, **kwargs):
+    if not _is_deleted_with(origin, User, instance.author_id):
+        counters.change(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.change(User, instance.follow_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_uncounted(sender, instance, origin=None, **kwargs):
+    if not _is_deleted_with(origin, User, instance.follow_id):
+        counters.change(User, instance.follow_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.change(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_uncounted(sender, instance, origin=None, **kwargs):
+    if not _is_deleted_with(origin, Recipe, instance.recipe_id):
+        counters.change(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def image_saving(sender, instance, update_fields, **kwargs):
+    instance._new_images = images.store_new_images(instance, update_fields)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def image_saved(sender, instance, **kwargs):
+    """Новые картинки обрабатываются в фоне после фиксации транзакции."""
+    for field in instance._new_images:
+        images.schedule(sender, instance.pk, field)
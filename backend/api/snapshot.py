@@ -0,0 +1,317 @@
+import csv
+import gzip
+import io
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from rest_framework.authtoken.models import Token
+
+from api.cache import reset_versions
+from api.constants import (
+    SNAPSHOT_BATCH_SIZE, SNAPSHOT_COMPRESSLEVEL, SNAPSHOT_FORMAT_VERSION,
+    SNAPSHOT_MAINTENANCE_WORK_MEM,
+)
+from api.relations import forget_users
+from recipe.models import Ingredient, Recipe, RecipeIngredient, ShortLink, Tag
+from user.models import Favorite, ShoppingCart, ShoppingListItem, Subscription
+
+User = get_user_model()
+
+MANIFEST = 'manifest.json'
+
+# Модели в порядке зависимостей: на строки таблицы ссылаются только
+# таблицы, стоящие после нее. В снимок входят все таблицы, ссылающиеся
+# на пользователей и рецепты: при загрузке очищаются только они.
+MODELS = [
+    User,
+    User.groups.through,
+    User.user_permissions.through,
+    Token,
+    LogEntry,
+    Tag,
+    Ingredient,
+    Recipe,
+    Recipe.tags.through,
+    RecipeIngredient,
+    ShortLink,
+    Subscription,
+    Favorite,
+    ShoppingCart,
+    ShoppingListItem,
+]
+
+
+def _fields(model):
+    """Сохраняемые поля модели. Вычисляемые столбцы БД заполняет сама."""
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.generated
+    ]
+
+
+def _file_name(model):
+    return f'{model._meta.label_lower}.csv.gz'
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def _copy_columns(model, fields):
+    return (f'{_quote(model._meta.db_table)} '
+            f'({", ".join(_quote(field.column) for field in fields)})')
+
+
+def _dump_postgresql(cursor, model, fields, file):
+    """Выгрузка таблицы через COPY TO STDOUT: строки формирует сервер,
+    Python только сжимает поток."""
+    columns = ', '.join(_quote(field.column) for field in fields)
+    cursor.cursor.copy_expert(
+        f'COPY (SELECT {columns} FROM {_quote(model._meta.db_table)} '
+        f'ORDER BY {_quote(model._meta.pk.column)}) '
+        f'TO STDOUT WITH (FORMAT csv, HEADER true)', file)
+    return cursor.cursor.rowcount
+
+
+def _to_csv(field, value):
+    """Значение в формате CSV команды COPY PostgreSQL."""
+    if value is None:
+        return None
+    if isinstance(field, models.JSONField):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(field, models.BooleanField):
+        return 't' if value else 'f'
+    return value
+
+
+def _dump_rows(model, fields, file):
+    """Выгрузка таблицы для остальных СУБД в том же формате CSV."""
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow(field.column for field in fields)
+    rows = 0
+
+    for row in model._base_manager.order_by('pk').values_list(
+            *(field.attname for field in fields)).iterator(
+                chunk_size=SNAPSHOT_BATCH_SIZE):
+        writer.writerow(
+            _to_csv(field, value) for field, value in zip(fields, row))
+        rows += 1
+
+    text.flush()
+    text.detach()
+    return rows
+
+
+def dump(directory):
+    """Выгрузить таблицы MODELS в каталог directory: по одному сжатому
+    CSV на таблицу и manifest.json со столбцами и числом строк. Все
+    таблицы читаются в одной транзакции, снимок согласован."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tables = []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if _is_postgresql():
+            cursor.execute(
+                'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+
+        for model in MODELS:
+            fields = _fields(model)
+
+            with gzip.open(directory / _file_name(model), 'wb',
+                           compresslevel=SNAPSHOT_COMPRESSLEVEL) as file:
+                if _is_postgresql():
+                    rows = _dump_postgresql(cursor, model, fields, file)
+                else:
+                    rows = _dump_rows(model, fields, file)
+
+            tables.append({
+                'model': model._meta.label_lower,
+                'columns': [field.column for field in fields],
+                'rows': rows,
+            })
+
+    (directory / MANIFEST).write_text(json.dumps(
+        {'version': SNAPSHOT_FORMAT_VERSION, 'tables': tables},
+        ensure_ascii=False, indent=2), encoding='utf-8')
+    return tables
+
+
+def _read_manifest(directory):
+    """Таблицы снимка. Столбцы должны совпадать с текущей схемой."""
+    manifest = json.loads(
+        (Path(directory) / MANIFEST).read_text(encoding='utf-8'))
+
+    if manifest.get('version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError('Неподдерживаемая версия снимка.')
+
+    tables = {table['model']: table for table in manifest['tables']}
+
+    for model in MODELS:
+        table = tables.get(model._meta.label_lower)
+        columns = [field.column for field in _fields(model)]
+
+        if table is None or sorted(table['columns']) != sorted(columns):
+            raise ValueError(
+                f'Таблица {model._meta.label_lower} в снимке не '
+                f'совпадает со схемой БД.')
+    return tables
+
+
+def _secondary_indexes(cursor, model):
+    """Индексы таблицы, не связанные с ограничениями: (имя,
+    определение). Ограничения первичного ключа и уникальности
+    остаются."""
+    cursor.execute(
+        'SELECT i.relname, pg_get_indexdef(i.oid) '
+        'FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid '
+        'WHERE x.indrelid = %s::regclass AND NOT EXISTS ('
+        'SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)',
+        [model._meta.db_table])
+    return cursor.fetchall()
+
+
+def _restore_postgresql(cursor, model, fields, file):
+    """Загрузка через COPY FROM STDIN. Пустые значения в столбцах NOT
+    NULL читаются как пустые строки, а не NULL: так загружаются и
+    снимки, выгруженные из других СУБД."""
+    options = 'FORMAT csv, HEADER true'
+    not_null = [
+        _quote(field.column) for field in fields if not field.null]
+
+    if not_null:
+        options += f', FORCE_NOT_NULL ({", ".join(not_null)})'
+    # COPY выполняется курсором драйвера: ошибки приводятся к исключениям
+    # Django, например IntegrityError.
+    with connection.wrap_database_errors:
+        cursor.cursor.copy_expert(
+            f'COPY {_copy_columns(model, fields)} FROM STDIN '
+            f'WITH ({options})', file)
+
+
+def _from_csv(field, value):
+    if value == '' and field.null:
+        return None
+    if isinstance(field, models.JSONField):
+        value = json.loads(value)
+    else:
+        value = field.to_python(value)
+    return field.get_db_prep_save(value, connection)
+
+
+def _restore_rows(cursor, model, fields, file):
+    """Загрузка для остальных СУБД: executemany пакетами без создания
+    объектов моделей."""
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+    columns = next(reader)
+    by_column = {field.column: field for field in fields}
+    ordered = [by_column[column] for column in columns]
+    placeholders = ', '.join(['%s'] * len(ordered))
+    sql = (f'INSERT INTO {_copy_columns(model, ordered)} '
+           f'VALUES ({placeholders})')
+
+    while batch := list(islice(reader, SNAPSHOT_BATCH_SIZE)):
+        cursor.executemany(sql, [
+            [_from_csv(field, value) for field, value in zip(ordered, row)]
+            for row in batch
+        ])
+
+
+def restore(directory):
+    """Заменить данные таблиц MODELS снимком из каталога directory.
+
+    Очищаются только таблицы снимка, без каскада на другие таблицы.
+    Строки загружаются в порядке зависимостей. В PostgreSQL индексы, не
+    связанные с ограничениями, удаляются перед загрузкой и строятся
+    заново после нее. Затем сбрасываются последовательности первичных
+    ключей. Все выполняется в одной транзакции: если строки снимка
+    ссылаются на отсутствующие группы, права или типы содержимого,
+    данные остаются прежними.
+
+    Сигналы при загрузке не отправляются, поэтому после фиксации
+    меняются версии данных загруженных объектов (см. _reset_caches).
+    """
+    directory = Path(directory)
+    tables = _read_manifest(directory)
+    restored = []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in connection.ops.sql_flush(
+                no_style(), [model._meta.db_table for model in MODELS],
+                reset_sequences=True):
+            cursor.execute(sql)
+
+        indexes = []
+
+        if _is_postgresql():
+            cursor.execute(
+                'SET LOCAL maintenance_work_mem = %s',
+                [SNAPSHOT_MAINTENANCE_WORK_MEM])
+            # Внешние ключи проверяются сразу при загрузке: отложенные
+            # проверки не дали бы построить индексы в этой же транзакции.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+            for model in MODELS:
+                for name, definition in _secondary_indexes(cursor, model):
+                    cursor.execute(f'DROP INDEX {_quote(name)}')
+                    indexes.append(definition)
+
+        for model in MODELS:
+            fields = _fields(model)
+            table = tables[model._meta.label_lower]
+
+            with gzip.open(directory / _file_name(model), 'rb') as file:
+                if _is_postgresql():
+                    _restore_postgresql(cursor, model, fields, file)
+                else:
+                    _restore_rows(cursor, model, fields, file)
+            restored.append((model._meta.label_lower, table['rows']))
+
+        for definition in indexes:
+            cursor.execute(definition)
+
+        for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+            cursor.execute(sql)
+
+        if _is_postgresql():
+            cursor.execute(
+                'ANALYZE ' + ', '.join(
+                    _quote(model._meta.db_table) for model in MODELS))
+
+    _reset_caches()
+    return restored
+
+
+def _id_batches(model):
+    ids = model.objects.order_by('pk').values_list(
+        'pk', flat=True).iterator(chunk_size=SNAPSHOT_BATCH_SIZE)
+
+    while batch := list(islice(ids, SNAPSHOT_BATCH_SIZE)):
+        yield batch
+
+
+def _reset_caches():
+    """Новые версии общих наборов данных, каждого рецепта и пользователя
+    и удаление множеств связей пользователей. Ключи ленты, фрагментов,
+    ETag и индекс ингредиентов всех процессов строятся заново. Кэш
+    целиком не очищается: в нем могут быть чужие ключи и сессии.
+    Версии удаленных объектов не меняются: их страниц больше нет."""
+    reset_versions(['recipe', 'tag', 'ingredient', 'user'])
+
+    for batch in _id_batches(Recipe):
+        reset_versions(f'recipe:{pk}' for pk in batch)
+
+    for batch in _id_batches(User):
+        reset_versions(
+            name for pk in batch for name in (f'user:{pk}', f'relations:{pk}'))
+        forget_users(batch)
@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from api.constants import MEDIA_HASH_CHUNK_SIZE
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище медиафайлов, в котором имя файла — хэш содержимого.
+
+    Каталог и расширение берутся из переданного имени, сама часть имени
+    заменяется на SHA-256 содержимого. Файл с таким именем уже содержит
+    те же байты, поэтому повторная запись пропускается, а содержимое по
+    адресу никогда не меняется и может кэшироваться без срока.
+    """
+
+    def get_content_name(self, name, content):
+        """Имя файла по хэшу содержимого. Файл читается частями с
+        начала."""
+        digest = hashlib.sha256()
+
+        for chunk in content.chunks(MEDIA_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+        content.seek(0)
+
+        directory, base = os.path.split(name)
+        ext = os.path.splitext(base)[1].lower()
+        return os.path.join(directory, f'{digest.hexdigest()}{ext}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.get_content_name(name, content)
+
+        if self.exists(name):
+            # Файл снова используется: очистка медиафайлов не удалит его
+            # в течение отсрочки, даже если раньше на него не ссылались.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
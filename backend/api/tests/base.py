@@ -0,0 +1,174 @@
+import base64
+import io
+import os
+import random
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import counters, shopping_list, short_links
+from api.constants import FEED_CACHE_ALIAS
+from recipe.models import Ingredient, Recipe, RecipeIngredient, ShortLink, Tag
+from user.models import Favorite, ShoppingCart, Subscription
+
+User = get_user_model()
+
+VIEWER_PASSWORD = 'budget-check-password'
+
+# Отдельные кэши, чтобы очистка в тестах не затронула рабочие. Версии
+# данных хранятся в файлах, как в общем кэше: проверяется тот же путь,
+# что и на сервере с Redis, включая ETag.
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(
+            tempfile.gettempdir(), f'foodgram-tests-{os.getpid()}'),
+    },
+    FEED_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-feed',
+    },
+}
+
+
+def image_content():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def image_data_uri():
+    """Небольшая картинка в формате base64 для запросов на запись."""
+    encoded = base64.b64encode(image_content()).decode()
+
+    return f'data:image/png;base64,{encoded}'
+
+
+def clear_caches():
+    """Очистка всех кэшей: следующий запрос выполняется без кэша."""
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def create_dataset(users=50, recipes=200, tags=10, ingredients=100, seed=0):
+    """Набор данных для проверок, созданный пакетными вставками.
+
+    Первый пользователь — зритель: у него есть избранное, корзина и
+    подписки. Возвращает зрителя и id объектов для путей запросов.
+    """
+    rnd = random.Random(seed)
+    password = make_password(VIEWER_PASSWORD)
+
+    users = User.objects.bulk_create(
+        User(username=f'budget_user_{i}',
+             email=f'budget_user_{i}@example.com',
+             first_name='Имя', last_name='Фамилия', password=password)
+        for i in range(users))
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'Тег {i}', slug=f'budget-tag-{i}')
+        for i in range(tags))
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'ingredient {i}', measurement_unit='г')
+        for i in range(ingredients))
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=rnd.choice(users), name=f'Рецепт {i}',
+               text='Описание рецепта', cooking_time=rnd.randint(1, 120),
+               image='recipe-images/budget.png')
+        for i in range(recipes))
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in rnd.sample(tags, rnd.randint(1, min(3, len(tags)))))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                         amount=rnd.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rnd.sample(
+            ingredients, rnd.randint(3, min(10, len(ingredients)))))
+
+    viewer = users[0]
+    Favorite.objects.bulk_create(
+        Favorite(user=viewer, recipe=recipe)
+        for recipe in rnd.sample(recipes, min(20, len(recipes))))
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=viewer, recipe=recipe)
+        for recipe in rnd.sample(recipes, min(10, len(recipes))))
+    Subscription.objects.bulk_create(
+        Subscription(user=viewer, follow=user)
+        for user in users[2:12])
+    # bulk_create не отправляет сигналы, списки покупок и счетчики
+    # пересчитываются.
+    shopping_list.rebuild([viewer.id])
+    counters.reconcile()
+
+    own_recipe = Recipe.objects.filter(author=viewer).first()
+
+    if own_recipe is None:
+        own_recipe = recipes[0]
+        Recipe.objects.filter(id=own_recipe.id).update(author=viewer)
+
+    recipe = next(
+        recipe for recipe in recipes
+        if recipe.author_id != viewer.id
+        and not viewer.favorites.filter(recipe=recipe).exists()
+        and not viewer.shopping_cart.filter(recipe=recipe).exists())
+
+    return viewer, {
+        'author': users[1].id,
+        'recipe': recipe.id,
+        'own_recipe': own_recipe.id,
+        'tag': tags[0].slug,
+        'tag_id': tags[0].id,
+        'ingredient': ingredients[0].id,
+        'short_code': short_links.get_short_code(recipe.id),
+        'legacy_short_code': ShortLink.objects.create(
+            recipe=recipe).short_code,
+    }
+
+
+@override_settings(CACHES=TEST_CACHES)
+class APITestCase(TestCase):
+    """Тесты API на общем наборе данных.
+
+    Данные создаются один раз на класс, каждый тест выполняется в
+    транзакции с откатом. Кэши очищаются перед каждым тестом: id
+    откаченных объектов могут повториться. Загруженные файлы пишутся во
+    временный каталог.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=cls.enterClassContext(tempfile.TemporaryDirectory())))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, cls.ids = create_dataset()
+        cls.token = Token.objects.create(user=cls.viewer)
+
+    def setUp(self):
+        clear_caches()
+        self.anonymous_client = APIClient()
+        self.viewer_client = APIClient()
+        self.viewer_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def request(self, method, path, authorized=True, **kwargs):
+        """Запрос к API. Потоковый ответ читается целиком: строки из БД
+        читаются во время отдачи."""
+        client = self.viewer_client if authorized else self.anonymous_client
+        response = getattr(client, method)(
+            path.format(**self.ids), **kwargs)
+
+        if response.streaming:
+            response.streamed_content = b''.join(response.streaming_content)
+        return response
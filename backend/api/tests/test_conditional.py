@@ -0,0 +1,44 @@
+from django.core.cache import caches
+from django.test import override_settings
+
+from api.tests.base import TEST_CACHES, APITestCase
+
+
+class ConditionalGetTests(APITestCase):
+    """ETag и Last-Modified строятся из версий в общем кэше."""
+
+    def test_not_modified(self):
+        response = self.request('get', '/api/recipes/{recipe}/')
+        etag = response['ETag']
+
+        response = self.request(
+            'get', '/api/recipes/{recipe}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_after_write(self):
+        etag = self.request('get', '/api/recipes/{recipe}/')['ETag']
+
+        self.request('post', '/api/recipes/{recipe}/favorite/')
+        response = self.request(
+            'get', '/api/recipes/{recipe}/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(CACHES={
+        **TEST_CACHES,
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tests-process-local',
+        },
+    })
+    def test_process_local_cache(self):
+        """Версии в памяти процесса не видны другим процессам: валидаторы
+        не отдаются."""
+        caches['default'].clear()
+        response = self.request('get', '/api/recipes/{recipe}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
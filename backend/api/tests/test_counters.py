@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import counters
+from api.tests.base import VIEWER_PASSWORD, APITestCase
+from recipe.models import Recipe
+
+User = get_user_model()
+
+
+class CounterSaveTests(APITestCase):
+    """Сохранение объекта, загруженного до изменения счетчика, не
+    возвращает старое значение."""
+
+    def test_stale_instance_save(self):
+        author = User.objects.get(pk=self.ids['author'])
+        recipe = Recipe.objects.get(pk=self.ids['recipe'])
+        counters.change(User, author.pk, 'followers_count', 1)
+        counters.change(User, author.pk, 'recipes_count', 1)
+        counters.change(Recipe, recipe.pk, 'favorites_count', 1)
+
+        author.first_name = 'Другое имя'
+        author.save()
+        recipe.name = 'Другое название'
+        recipe.save()
+
+        author.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual(author.first_name, 'Другое имя')
+        self.assertEqual(recipe.name, 'Другое название')
+        self.assertEqual(counters.find_drift(), {
+            'User.recipes_count': 1,
+            'User.followers_count': 1,
+            'Recipe.favorites_count': 1,
+        })
+
+    def test_api_saves_skip_counters(self):
+        """Удаление аватара, смена пароля и изменение рецепта сохраняют
+        объекты целиком, но не записывают счетчики."""
+        with CaptureQueriesContext(connection) as queries:
+            self.request('delete', '/api/users/me/avatar/')
+            self.request('post', '/api/users/set_password/', data={
+                'current_password': VIEWER_PASSWORD,
+                'new_password': VIEWER_PASSWORD,
+            })
+            response = self.request(
+                'patch', '/api/recipes/{own_recipe}/', format='json', data={
+                    'name': 'Новое название',
+                    'text': 'Описание',
+                    'cooking_time': 5,
+                    'tags': [self.ids['tag_id']],
+                    'ingredients': [
+                        {'id': self.ids['ingredient'], 'amount': 1}],
+                })
+        self.assertEqual(response.status_code, 200)
+
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertTrue(updates)
+
+        for sql in updates:
+            for field in ('recipes_count', 'followers_count',
+                          'favorites_count'):
+                self.assertNotIn(field, sql)
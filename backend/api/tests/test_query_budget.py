@@ -0,0 +1,216 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from unittest import skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+
+from api import counters, shopping_list
+from api.tests.base import (
+    VIEWER_PASSWORD, APITestCase, clear_caches, image_content, image_data_uri,
+)
+
+# Оценка количества строк через EXPLAIN выполняется только в PostgreSQL.
+EXPLAIN = int(connection.vendor == 'postgresql')
+
+# Чтение: (название, путь, авторизация, запросов к БД без кэша, запросов
+# при повторном запросе).
+READ_ENDPOINTS = [
+    ('api-root', '/api/', False, 0, 0),
+    ('users-list-anon', '/api/users/?limit=10', False,
+     1 + EXPLAIN, 1 + EXPLAIN),
+    ('users-list', '/api/users/?limit=10', True, 4 + EXPLAIN, 3 + EXPLAIN),
+    ('users-detail', '/api/users/{author}/', True, 3, 2),
+    ('users-me', '/api/users/me/', True, 2, 1),
+    ('users-subscriptions',
+     '/api/users/subscriptions/?limit=6&recipes_limit=3', True, 4, 4),
+    ('users-subscriptions-limit-50',
+     '/api/users/subscriptions/?limit=50&recipes_limit=3', True, 4, 4),
+    ('recipes-list-anon', '/api/recipes/', False, 4, 0),
+    ('recipes-list-anon-limit-50', '/api/recipes/?limit=50', False, 4, 0),
+    ('recipes-list-cursor-anon', '/api/recipes/?cursor=&limit=50',
+     False, 3, 0),
+    ('recipes-list', '/api/recipes/', True, 7, 2),
+    ('recipes-list-limit-50', '/api/recipes/?limit=50', True, 7, 2),
+    ('recipes-list-filtered', '/api/recipes/?tags={tag}&author={author}',
+     True, 4, 2),
+    ('recipes-list-favorited', '/api/recipes/?is_favorited=1', True, 8, 3),
+    ('recipes-list-in-cart', '/api/recipes/?is_in_shopping_cart=1',
+     True, 8, 3),
+    ('recipes-list-search', '/api/recipes/?search=цепт 1', True, 7, 2),
+    ('recipes-detail-anon', '/api/recipes/{recipe}/', False, 4, 4),
+    ('recipes-detail', '/api/recipes/{recipe}/', True, 7, 5),
+    ('recipes-get-link', '/api/recipes/{recipe}/get-link/', True, 2, 2),
+    ('short-link-redirect', '/api/s/{short_code}/', False, 1, 0),
+    ('short-link-redirect-legacy', '/api/s/{legacy_short_code}/',
+     False, 1, 0),
+    ('recipes-download-cart', '/api/recipes/download_shopping_cart/',
+     True, 2, 2),
+    ('recipes-download-cart-csv',
+     '/api/recipes/download_shopping_cart/?type=csv', True, 2, 2),
+    ('recipes-download-cart-json',
+     '/api/recipes/download_shopping_cart/?type=json', True, 2, 2),
+    ('tags-list', '/api/tags/', False, 1, 1),
+    ('tags-detail', '/api/tags/{tag_id}/', False, 1, 1),
+    ('ingredients-list', '/api/ingredients/', False, 1, 1),
+    ('ingredients-search', '/api/ingredients/?name=ingredient 1',
+     False, 1, 0),
+    ('ingredients-detail', '/api/ingredients/{ingredient}/', False, 1, 1),
+]
+
+# Чтение только в PostgreSQL.
+POSTGRESQL_READ_ENDPOINTS = [
+    ('recipes-list-q', '/api/recipes/?q=рецепт&tags={tag}', True, 7, 2),
+]
+
+# Запись в порядке выполнения: (название, метод, путь, авторизация,
+# запросов к БД). Порядок важен: запросы меняют данные.
+WRITE_ENDPOINTS = [
+    ('token-login', 'post', '/api/auth/token/login/', False, 4),
+    ('users-me-avatar-put', 'put', '/api/users/me/avatar/', True, 4),
+    ('users-me-avatar-delete', 'delete', '/api/users/me/avatar/', True, 3),
+    ('users-subscribe', 'post', '/api/users/{author}/subscribe/', True, 11),
+    ('users-unsubscribe', 'delete', '/api/users/{author}/subscribe/',
+     True, 5),
+    ('users-set-password', 'post', '/api/users/set_password/', True, 3),
+    ('recipes-create', 'post', '/api/recipes/', True, 17),
+    ('recipes-update', 'patch', '/api/recipes/{own_recipe}/', True, 30),
+    ('recipes-favorite', 'post', '/api/recipes/{recipe}/favorite/', True, 9),
+    ('recipes-unfavorite', 'delete', '/api/recipes/{recipe}/favorite/',
+     True, 5),
+    ('recipes-cart-add', 'post', '/api/recipes/{recipe}/shopping_cart/',
+     True, 12),
+    ('recipes-cart-remove', 'delete',
+     '/api/recipes/{recipe}/shopping_cart/', True, 9),
+    ('recipes-image', 'put', '/api/recipes/{own_recipe}/image/', True, 5),
+    ('recipes-delete', 'delete', '/api/recipes/{own_recipe}/', True, 16),
+    ('token-logout', 'post', '/api/auth/token/logout/', True, 2),
+]
+
+# Эндпоинты, принимающие файлы в multipart/form-data.
+MULTIPART_ENDPOINTS = {'recipes-image'}
+
+# Сравнение времени ответа с базовыми значениями включается переменной
+# окружения QUERY_BUDGET_BASELINE с путем к JSON файлу.
+BASELINE = os.getenv('QUERY_BUDGET_BASELINE')
+UPDATE_BASELINE = bool(os.getenv('QUERY_BUDGET_UPDATE_BASELINE'))
+TOLERANCE = float(os.getenv('QUERY_BUDGET_TOLERANCE', 1.5))
+REPEAT = int(os.getenv('QUERY_BUDGET_REPEAT', 5))
+
+
+class QueryBudgetTests(APITestCase):
+    """Точное количество запросов к БД для всех эндпоинтов API.
+
+    Запросы на чтение проверяются дважды: после очистки всех кэшей
+    (версий, множеств связей, ленты, индекса ингредиентов) и повторно,
+    когда кэши заполнены. Первый замер находит N+1 в путях без кэша.
+    """
+
+    def _payloads(self):
+        """Тела запросов на запись."""
+        image = image_data_uri()
+        recipe = {
+            'name': 'Новый рецепт',
+            'text': 'Описание нового рецепта',
+            'cooking_time': 15,
+            'image': image,
+            'tags': [self.ids['tag_id']],
+            'ingredients': [
+                {'id': self.ids['ingredient'], 'amount': 100},
+                {'id': self.ids['ingredient'] + 1, 'amount': 5},
+            ],
+        }
+
+        return {
+            'token-login': {
+                'email': self.viewer.email,
+                'password': VIEWER_PASSWORD,
+            },
+            'users-me-avatar-put': {'avatar': image},
+            'users-set-password': {
+                'current_password': VIEWER_PASSWORD,
+                'new_password': VIEWER_PASSWORD,
+            },
+            'recipes-create': recipe,
+            'recipes-update': recipe,
+            'recipes-image': {'image': SimpleUploadedFile(
+                'budget.png', image_content(), 'image/png')},
+        }
+
+    def _check_reads(self, endpoints):
+        for name, path, authorized, cold, warm in endpoints:
+            with self.subTest(name, state='cold'):
+                clear_caches()
+
+                with self.assertNumQueries(cold):
+                    response = self.request('get', path, authorized)
+                self.assertLess(response.status_code, 400)
+
+            with self.subTest(name, state='warm'):
+                with self.assertNumQueries(warm):
+                    response = self.request('get', path, authorized)
+                self.assertLess(response.status_code, 400)
+
+    def test_read_endpoints(self):
+        self._check_reads(READ_ENDPOINTS)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL.')
+    def test_postgresql_read_endpoints(self):
+        self._check_reads(POSTGRESQL_READ_ENDPOINTS)
+
+    def test_write_endpoints(self):
+        payloads = self._payloads()
+
+        for name, method, path, authorized, queries in WRITE_ENDPOINTS:
+            with self.subTest(name):
+                clear_caches()
+
+                with self.assertNumQueries(queries):
+                    response = self.request(
+                        method, path, authorized, data=payloads.get(name),
+                        format=(
+                            'multipart' if name in MULTIPART_ENDPOINTS
+                            else 'json'))
+                self.assertLess(response.status_code, 400)
+
+        # Списки покупок и счетчики, обновленные запросами, совпадают с
+        # полным пересчетом.
+        self.assertEqual(shopping_list.find_drift(), {})
+        self.assertFalse(any(counters.find_drift().values()))
+
+    @skipUnless(BASELINE, 'Не задан QUERY_BUDGET_BASELINE.')
+    def test_timings(self):
+        """Медиана времени ответа повторных запросов на чтение не больше
+        базового значения, умноженного на QUERY_BUDGET_TOLERANCE. С
+        QUERY_BUDGET_UPDATE_BASELINE результаты записываются в файл."""
+        path = Path(BASELINE)
+        baseline = {}
+
+        if path.exists() and not UPDATE_BASELINE:
+            baseline = json.loads(path.read_text(encoding='utf-8'))
+
+        results = {}
+
+        for name, url, authorized, _, _ in READ_ENDPOINTS:
+            timings = []
+
+            for _ in range(REPEAT):
+                started = time.perf_counter()
+                self.request('get', url, authorized)
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {'ms': round(statistics.median(timings), 2)}
+
+        if UPDATE_BASELINE:
+            path.write_text(
+                json.dumps(results, indent=2, ensure_ascii=False),
+                encoding='utf-8')
+            return
+
+        for name, result in results.items():
+            if name in baseline:
+                with self.subTest(name):
+                    self.assertLessEqual(
+                        result['ms'], baseline[name]['ms'] * TOLERANCE)
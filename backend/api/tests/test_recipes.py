@@ -0,0 +1,63 @@
+from api.tests.base import APITestCase, clear_caches
+
+
+class RecipeQueryCountTests(APITestCase):
+    """Количество запросов списка и страницы рецепта не зависит от числа
+    рецептов на странице, их тегов и ингредиентов."""
+
+    def _check_recipe(self, recipe):
+        self.assertTrue(recipe['tags'])
+        self.assertTrue(recipe['ingredients'])
+        self.assertIn('username', recipe['author'])
+
+    def test_list(self):
+        for authorized, queries in ((False, 4), (True, 7)):
+            for limit in (10, 50):
+                with self.subTest(authorized=authorized, limit=limit):
+                    clear_caches()
+
+                    with self.assertNumQueries(queries):
+                        response = self.request(
+                            'get', f'/api/recipes/?limit={limit}',
+                            authorized)
+
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
+
+                    for recipe in response.data['results']:
+                        self._check_recipe(recipe)
+
+    def test_retrieve(self):
+        for authorized, queries in ((False, 4), (True, 7)):
+            with self.subTest(authorized=authorized):
+                clear_caches()
+
+                with self.assertNumQueries(queries):
+                    response = self.request(
+                        'get', '/api/recipes/{recipe}/', authorized)
+
+                self.assertEqual(response.status_code, 200)
+                self._check_recipe(response.data)
+
+
+class RecipeCursorTests(APITestCase):
+    """Пагинация по курсору."""
+
+    def test_pages(self):
+        response = self.request('get', '/api/recipes/?cursor=&limit=150')
+        first = [recipe['id'] for recipe in response.data['results']]
+
+        response = self.request('get', response.data['next'])
+        second = [recipe['id'] for recipe in response.data['results']]
+
+        self.assertEqual(len(first), 150)
+        self.assertEqual(len(second), 50)
+        self.assertIsNone(response.data['next'])
+        self.assertFalse(set(first) & set(second))
+
+    def test_search_rejected(self):
+        """Порядок по релевантности не заменяется порядком курсора."""
+        response = self.request('get', '/api/recipes/?cursor=&search=цепт 1')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.data)
@@ -0,0 +1,24 @@
+from api.relations import FAVORITES, FOLLOWS, get_ids
+from api.tests.base import APITestCase
+from user.models import Favorite, Subscription
+
+
+class RelationCacheTests(APITestCase):
+    """Множества связей в кэше сбрасываются при изменении связей."""
+
+    def test_invalidated_on_change(self):
+        recipe = self.ids['recipe']
+        author = self.ids['author']
+        self.assertNotIn(recipe, get_ids(self.viewer.id, FAVORITES))
+        self.assertNotIn(author, get_ids(self.viewer.id, FOLLOWS))
+
+        favorite = Favorite.objects.create(user=self.viewer, recipe_id=recipe)
+        Subscription.objects.create(user=self.viewer, follow_id=author)
+        self.assertIn(recipe, get_ids(self.viewer.id, FAVORITES))
+        self.assertIn(author, get_ids(self.viewer.id, FOLLOWS))
+
+        favorite.delete()
+        self.assertNotIn(recipe, get_ids(self.viewer.id, FAVORITES))
+        self.assertEqual(
+            get_ids(self.viewer.id, FAVORITES),
+            set(self.viewer.favorites.values_list('recipe_id', flat=True)))
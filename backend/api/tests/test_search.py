@@ -0,0 +1,32 @@
+from unittest import skipUnless
+
+from django.db import connection
+
+from api.filters import RecipeFilterSet
+from api.tests.base import APITestCase
+from recipe.models import Recipe
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL.')
+class SearchIndexTests(APITestCase):
+    """Поисковые запросы обслуживаются индексами.
+
+    Последовательное чтение таблицы отключается: на небольшом наборе
+    данных планировщик выбрал бы его и при подходящем индексе. Если
+    индекс не подходит к условию, в плане все равно останется Seq Scan.
+    """
+
+    def _plan(self, filterset_class, data, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return filterset_class(data, queryset=queryset).qs.explain()
+
+    def test_recipe_search(self):
+        plan = self._plan(RecipeFilterSet, {'search': 'цепт 1'},
+                          Recipe.objects.all())
+        self.assertIn('recipe_name_trgm_idx', plan)
+
+    def test_recipe_full_text_search(self):
+        plan = self._plan(RecipeFilterSet, {'q': 'рецепт'},
+                          Recipe.objects.all())
+        self.assertIn('recipe_search_vector_idx', plan)
@@ -0,0 +1,95 @@
+from django.db import transaction
+
+from api import shopping_list
+from api.tests.base import APITestCase, image_data_uri
+from recipe.models import RecipeIngredient
+from user.models import ShoppingCart, ShoppingListItem
+
+
+class ShoppingListTests(APITestCase):
+    """Суммы в списках покупок после каждого изменения совпадают с полным
+    пересчетом по корзинам."""
+
+    def _assert_no_drift(self):
+        self.assertEqual(shopping_list.find_drift(), {})
+
+    def _amounts(self, user_id):
+        return dict(ShoppingListItem.objects.filter(
+            user_id=user_id, amount__gt=0
+        ).values_list('ingredient_id', 'amount'))
+
+    def _missing_ingredient(self, recipe_id):
+        """Ингредиент, которого нет в рецепте."""
+        current = set(RecipeIngredient.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+        return next(
+            pk for pk in range(self.ids['ingredient'],
+                               self.ids['ingredient'] + 100)
+            if pk not in current)
+
+    def _replace_ingredients(self, ingredients):
+        response = self.request(
+            'patch', '/api/recipes/{own_recipe}/', format='json', data={
+                'name': 'Рецепт с новыми ингредиентами',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'image': image_data_uri(),
+                'tags': [self.ids['tag_id']],
+                'ingredients': [
+                    {'id': pk, 'amount': amount}
+                    for pk, amount in ingredients.items()
+                ],
+            })
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_replace_remove(self):
+        recipe = self.ids['own_recipe']
+        other_user = self.ids['author']
+        ShoppingCart.objects.filter(recipe_id=recipe).delete()
+        before = self._amounts(self.viewer.id)
+
+        response = self.request('post', '/api/recipes/{own_recipe}/'
+                                'shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+        with transaction.atomic():
+            ShoppingCart.objects.create(user_id=other_user, recipe_id=recipe)
+        self._assert_no_drift()
+
+        # Один ингредиент остается с другим количеством, остальные
+        # заменяются.
+        current = RecipeIngredient.objects.filter(
+            recipe_id=recipe).values_list('ingredient_id', flat=True)
+        kept = current[0]
+        new = self._missing_ingredient(recipe)
+        self._replace_ingredients({kept: 7, new: 3})
+        self._assert_no_drift()
+        self.assertEqual(self._amounts(other_user), {kept: 7, new: 3})
+
+        response = self.request(
+            'delete', '/api/recipes/{own_recipe}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self._assert_no_drift()
+        self.assertEqual(self._amounts(self.viewer.id), before)
+
+    def test_single_ingredient_and_recipe_delete(self):
+        recipe = self.ids['recipe']
+        self.request('post', '/api/recipes/{recipe}/shopping_cart/')
+
+        recipe_ingredient = RecipeIngredient.objects.filter(
+            recipe_id=recipe).first()
+        recipe_ingredient.amount += 11
+        recipe_ingredient.save()
+        self._assert_no_drift()
+
+        recipe_ingredient.delete()
+        self._assert_no_drift()
+
+        with transaction.atomic():
+            RecipeIngredient.objects.create(
+                recipe_id=recipe,
+                ingredient_id=self._missing_ingredient(recipe), amount=4)
+        self._assert_no_drift()
+
+        recipe_ingredient.recipe.delete()
+        self._assert_no_drift()
@@ -0,0 +1,34 @@
+from api.tests.base import APITestCase
+from recipe.models import Recipe
+
+
+class ShortLinkTests(APITestCase):
+    """Переход по короткой ссылке только на существующий рецепт."""
+
+    def test_redirect(self):
+        for code in ('short_code', 'legacy_short_code'):
+            with self.subTest(code):
+                response = self.request(
+                    'get', f'/api/s/{{{code}}}/', False)
+
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(
+                    response['Location'], f'/recipes/{self.ids["recipe"]}/')
+
+    def test_unknown_code(self):
+        for code in ('zzzzzz', '000000', 'abc', 'не-код'):
+            with self.subTest(code):
+                response = self.request('get', f'/api/s/{code}/', False)
+                self.assertEqual(response.status_code, 404)
+
+    def test_deleted_recipe(self):
+        # Коды попадают в кэш до удаления рецепта.
+        for code in ('short_code', 'legacy_short_code'):
+            self.request('get', f'/api/s/{{{code}}}/', False)
+        Recipe.objects.get(pk=self.ids['recipe']).delete()
+
+        for code in ('short_code', 'legacy_short_code'):
+            with self.subTest(code):
+                response = self.request(
+                    'get', f'/api/s/{{{code}}}/', False)
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,96 @@
+import io
+import tempfile
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api import snapshot
+from api.cache import bump_version, get_version
+from api.relations import FAVORITES, RELATION_KEY, get_ids
+from api.tests.base import TEST_CACHES, clear_caches
+from recipe.models import Recipe, Tag
+
+User = get_user_model()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SnapshotTests(TransactionTestCase):
+    """Снимок загружается вместо текущих данных, версии в общем кэше
+    меняются для всех процессов."""
+
+    def setUp(self):
+        clear_caches()
+
+    def test_models_closed_under_references(self):
+        """Очищаются только таблицы снимка, поэтому в нем должны быть все
+        таблицы, ссылающиеся на его таблицы."""
+        tables = {model._meta.db_table for model in snapshot.MODELS}
+
+        for model in apps.get_models(include_auto_created=True):
+            if model._meta.proxy or model._meta.db_table in tables:
+                continue
+
+            for field in model._meta.concrete_fields:
+                if field.is_relation:
+                    self.assertNotIn(
+                        field.related_model._meta.db_table, tables,
+                        f'{model._meta.label}.{field.name}')
+
+    def test_dump_restore(self):
+        group = Group.objects.create(name='Редакторы')
+        user = User.objects.create(username='author', email='a@example.com')
+        user.groups.add(group)
+        token = Token.objects.create(user=user)
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Текст', cooking_time=1,
+            image='recipe-images/snapshot.png')
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot.dump(directory)
+            Tag.objects.create(name='Ужин', slug='dinner')
+            bump_version('tag')
+            versions = {
+                name: get_version(name)
+                for name in ('tag', f'recipe:{recipe.pk}', f'user:{user.pk}')
+            }
+            get_ids(user.pk, FAVORITES)
+            cache.set('other-app', 'value')
+
+            output = io.StringIO()
+            call_command('restore_snapshot', directory, '--no-input',
+                         stdout=output)
+
+        self.assertEqual(
+            list(Tag.objects.values_list('slug', flat=True)), ['breakfast'])
+        self.assertEqual(list(user.groups.all()), [group])
+        self.assertTrue(Token.objects.filter(key=token.key).exists())
+
+        for name, version in versions.items():
+            self.assertNotEqual(get_version(name), version, name)
+        self.assertIsNone(cache.get(RELATION_KEY.format(FAVORITES, user.pk)))
+        self.assertEqual(cache.get('other-app'), 'value')
+        self.assertNotIn('перезапустите', output.getvalue())
+
+    def test_missing_group(self):
+        """Строки снимка ссылаются на удаленную группу: загрузка
+        отменяется, данные остаются прежними."""
+        group = Group.objects.create(name='Редакторы')
+        user = User.objects.create(username='author', email='a@example.com')
+        user.groups.add(group)
+
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot.dump(directory)
+            group.delete()
+            Tag.objects.create(name='Ужин', slug='dinner')
+
+            with self.assertRaises(CommandError):
+                call_command('restore_snapshot', directory, '--no-input',
+                             stdout=io.StringIO())
+
+        self.assertTrue(Tag.objects.filter(slug='dinner').exists())
@@ -0,0 +1,43 @@
+from api.cache import get_version
+from api.tests.base import VIEWER_PASSWORD, APITestCase, image_data_uri
+
+
+class UserVersionTests(APITestCase):
+    """Версия пользователей, от которой зависит кэш ленты, меняется
+    только при изменении полей автора в карточке рецепта."""
+
+    def _assert_version(self, changed, method, path, **kwargs):
+        version = get_version('user')
+        response = self.request(method, path, **kwargs)
+
+        self.assertLess(response.status_code, 400)
+        if changed:
+            self.assertNotEqual(get_version('user'), version)
+        else:
+            self.assertEqual(get_version('user'), version)
+
+    def test_unchanged(self):
+        self._assert_version(
+            False, 'post', '/api/users/', authorized=False, data={
+                'email': 'new@example.com',
+                'username': 'new_user',
+                'first_name': 'Имя',
+                'last_name': 'Фамилия',
+                'password': 'Nn2-new-password',
+            })
+        self._assert_version(
+            False, 'post', '/api/auth/token/login/', authorized=False,
+            data={'email': self.viewer.email, 'password': VIEWER_PASSWORD})
+        self._assert_version(
+            False, 'post', '/api/users/set_password/', data={
+                'current_password': VIEWER_PASSWORD,
+                'new_password': VIEWER_PASSWORD,
+            })
+        self._assert_version(
+            False, 'post', '/api/users/{author}/subscribe/')
+
+    def test_changed(self):
+        self._assert_version(
+            True, 'put', '/api/users/me/avatar/', format='json',
+            data={'avatar': image_data_uri()})
+        self._assert_version(True, 'delete', '/api/users/me/avatar/')
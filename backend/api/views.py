@@ -1,25 +1,35 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.db import transaction
+from django.db.models import Prefetch, Value
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from api.filters import IngredientFilterSet, RecipeFilterSet
-from api.pagination import RecipePagination
+from api import feed_cache, fragment_cache, shopping_list
+from api.constants import (
+    COUNT_CACHED, COUNT_ESTIMATE, COUNT_EXACT, RECIPE_READ_ACTIONS,
+)
+from api.filters import RecipeFilterSet
+from api.ingredient_index import ingredient_index
+from api.mixins import ConditionalGetMixin
+from api.pagination import RecipePagination, UserPagination
 from api.permissions import AuthorOrReadOnly
+from api.relations import FAVORITES, FOLLOWS, SHOPPING_CART, get_relation_ids
 from api.serializers import (
     AvatarSerializer, FavoriteWriteSerializer, IngredientSerializer,
-    RecipeSerializer, RecipeShortSerializer, ShoppingCartWriteSerializer,
-    SubscriptionReadSerializer, SubscriptionWriteSerializer, TagsSerializer,
+    RecipeImageSerializer, RecipeSerializer, RecipeShortSerializer,
+    ShoppingCartWriteSerializer, SubscriptionReadSerializer,
+    SubscriptionWriteSerializer, TagsSerializer, get_recipes_limit,
 )
-from recipe.models import Ingredient, Recipe, ShortLink, Tag
+from api.short_links import get_recipe_id, get_short_code
+from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag
 from user.models import Favorite, ShoppingCart, Subscription
 
 User = get_user_model()
@@ -28,14 +38,16 @@ User = get_user_model()
 def _create_using_serializer(write_serializer_class, serializer_data,
                              context):
     """Создание объекта модели используя сериализатор. Валидацию убрать в
-    сериализатор."""
+    сериализатор. Объект сохраняется в одной транзакции с обработчиками
+    сигналов, которые обновляют списки покупок и счетчики."""
     write_serializer = write_serializer_class(
         data=serializer_data,
         context=context
     )
     write_serializer.is_valid(raise_exception=True)
 
-    return write_serializer.save()
+    with transaction.atomic():
+        return write_serializer.save()
 
 
 def _delete_object(model, filter_data):
@@ -50,8 +62,16 @@ def _delete_object(model, filter_data):
 
 class UserViewSet(DjoserUserViewSet):
     """Представление пользователей."""
-    pagination_class = LimitOffsetPagination
-    queryset = User.objects.all().annotate(recipes_count=Count('recipes'))
+    pagination_class = UserPagination
+    queryset = User.objects.all()
+
+    @property
+    def count_strategy(self):
+        """Подписки пользователя считаются точно, остальные списки
+        оцениваются планировщиком, если строк много."""
+        if self.action == 'subscriptions':
+            return COUNT_EXACT
+        return COUNT_ESTIMATE
 
     def get_permissions(self):
         """
@@ -137,9 +157,27 @@ class UserViewSet(DjoserUserViewSet):
 
     @action(methods=['get'], detail=False)
     def subscriptions(self, request):
-        """action просмотра страницы подписок."""
+        """action просмотра страницы подписок.
+
+        Последние рецепты всех авторов страницы загружаются одним запросом:
+        Prefetch со срезом выполняется через ROW_NUMBER() OVER (PARTITION
+        BY author). Флаг is_subscribed на этой странице всегда истинный и
+        передается аннотацией.
+        """
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time',
+            'author')
+        recipes_limit = get_recipes_limit(request)
+
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+
         follows = self.queryset.filter(
             follows__user=request.user
+        ).annotate(
+            is_subscribed=Value(True)
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
         )
 
         # Подключение пагинации.
@@ -157,25 +195,146 @@ class UserViewSet(DjoserUserViewSet):
 
 # --- ПРЕДСТАВЛЕНИЯ РЕЦЕПТОВ ---
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Настройка представления для рецептов."""
-    queryset = Recipe.objects.all().prefetch_related('recipe_ingredients')
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     pagination_class = RecipePagination
     permission_classes = [AuthorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilterSet
+    count_strategy = COUNT_CACHED
+    count_versions = ['recipe']
+    exact_count_params = ['is_favorited', 'is_in_shopping_cart']
+    conditional_actions = ['retrieve']
+    vary_on_authorization = True
+
+    def _with_related_data(self, queryset):
+        """Подгрузить автора, теги и ингредиенты заранее, чтобы страница не
+        выполняла запросы на каждый рецепт."""
+        return queryset.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).only(
+                    'recipe', 'amount', 'ingredient',
+                    'ingredient__name', 'ingredient__measurement_unit')),
+        )
+
+    def get_queryset(self):
+        """Для чтения подгрузить связанные данные. Флаги is_favorited и
+        is_in_shopping_cart сериализатор берет из кэша связей. Для записи
+        и остальных action используется простой queryset."""
+        queryset = super().get_queryset()
+
+        if self.action not in RECIPE_READ_ACTIONS:
+            return queryset
+        return self._with_related_data(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """Страницы ленты для анонимных пользователей берутся из кэша: у
+        них нет флагов, зависящих от пользователя."""
+        if request.user.is_authenticated:
+            return self._list_from_fragments(request)
+        return feed_cache.get_or_set(
+            request, lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs))
+
+    def _list_from_fragments(self, request):
+        """Лента авторизованного пользователя из кэша фрагментов.
+
+        Запрос страницы выбирает только id, дату и автора. Общая для всех
+        часть рецептов берется из кэша, отсутствующие фрагменты
+        сериализуются одним пакетом, затем поверх них накладываются флаги
+        пользователя из кэша связей.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).select_related(
+            None
+        ).prefetch_related(
+            None
+        ).only(
+            'id', 'pub_date', 'author_id'
+        )
+        page = self.paginate_queryset(queryset)
+        relation_ids = get_relation_ids(
+            request.user.id, [FAVORITES, SHOPPING_CART, FOLLOWS])
+        keys = fragment_cache.make_keys(request, page)
+        fragments = fragment_cache.get_fragments(keys)
+        missing = [recipe.id for recipe in page if recipe.id not in fragments]
+
+        if missing:
+            # Флаги заданы заранее, чтобы сериализатор не обращался к БД:
+            # во фрагмент они не попадают.
+            recipes = self._with_related_data(
+                Recipe.objects.filter(id__in=missing)
+            ).annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+            serializer = self.get_serializer(
+                recipes, many=True, context={
+                    **self.get_serializer_context(), 'followed_ids': set()})
+            fragment_cache.set_fragments(keys, serializer.data)
+            fragments.update(
+                (fragment['id'], fragment) for fragment in serializer.data)
+
+        return self.get_paginated_response([
+            fragment_cache.overlay(
+                fragments[recipe.id],
+                recipe.id in relation_ids[FAVORITES],
+                recipe.id in relation_ids[SHOPPING_CART],
+                recipe.author_id in relation_ids[FOLLOWS])
+            for recipe in page
+        ])
+
+    def get_validator_versions(self):
+        """Версии данных страницы рецепта: сам рецепт, автор, теги,
+        ингредиенты и связи текущего пользователя, от которых зависят
+        is_favorited, is_in_shopping_cart и is_subscribed."""
+        try:
+            pk = int(self.kwargs['pk'])
+        except ValueError:
+            return None
+
+        author_id = Recipe.objects.filter(pk=pk).values_list(
+            'author_id', flat=True).first()
+
+        if author_id is None:
+            return None
+
+        names = [f'recipe:{pk}', f'user:{author_id}', 'tag', 'ingredient']
+        user = self.request.user
+
+        if user.is_authenticated:
+            names.append(f'relations:{user.id}')
+        return names
 
     @action(methods=['get'], url_path='get-link', detail=True)
     def get_link(self, request, pk):
-        """Эндпоинт для получения короткой ссылки на рецепт."""
+        """Эндпоинт для получения короткой ссылки на рецепт. Код
+        вычисляется из id рецепта и не хранится в БД."""
         recipe = self.get_object()
-        short_link_obj, _ = ShortLink.objects.get_or_create(recipe=recipe)
-        short_link_path = f'/s/{short_link_obj.short_code}/'
+        short_link_path = f'/s/{get_short_code(recipe.id)}/'
         short_link_url = request.build_absolute_uri(short_link_path)
 
         return Response({'short-link': short_link_url})
 
+    @action(methods=['put'], detail=True, parser_classes=[MultiPartParser])
+    def image(self, request, pk):
+        """Замена картинки рецепта файлом multipart/form-data: файл не
+        кодируется в base64 и не читается в память целиком."""
+        recipe = self.get_object()
+        serializer = RecipeImageSerializer(
+            recipe, data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return Response(serializer.data)
+
     @action(methods=['post', 'delete'], detail=True,
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk):
@@ -234,54 +393,62 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=['get'], detail=False)
     def download_shopping_cart(self, request):
-        """Эндпоинт для загрузки списка ингредиентов."""
-        recipes_ids = request.user.shopping_cart.values_list(
-            'recipe', flat=True)
-        ingredients = Ingredient.objects.filter(
-            recipes__in=recipes_ids
-        ).values(
-            'name', 'measurement_unit'
-        ).annotate(
-            total_amount=Sum('recipe_ingredients__amount')
-        )
-
-        response = HttpResponse(content_type='text/plain; charset=utf8')
-        response['Content-Disposition'] = ('attachment;'
-                                           'filename="shopping_cart.txt"')
-        text = []
-        text.append('Список ингредиентов:\n')
-
-        for ingredient in ingredients:
-            text.append(f'{ingredient["name"].capitalize()}: '
-                        f'{ingredient["total_amount"]} '
-                        f'{ingredient["measurement_unit"]}\n')
-
-        response.writelines(text)
+        """Эндпоинт для загрузки списка ингредиентов. Формат файла задается
+        параметром type: txt (по умолчанию), csv или json. Строки читаются
+        из БД частями и сразу отдаются клиенту, поэтому расход памяти не
+        зависит от размера корзины."""
+        file_format = request.query_params.get('type', 'txt')
+
+        if file_format not in shopping_list.FORMATS:
+            return Response(
+                f'Неизвестный формат {file_format}. Доступные форматы: '
+                f'{", ".join(shopping_list.FORMATS)}',
+                status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, render = shopping_list.FORMATS[file_format]
+        response = StreamingHttpResponse(
+            render(shopping_list.get_shopping_list(request.user)),
+            content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{file_format}"')
 
         return response
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Настройка представления для тэгов."""
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     pagination_class = None
     http_method_names = ['get']
+    validator_versions = ['tag']
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Настройка представления для ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = [DjangoFilterBackend]
-    filterset_class = IngredientFilterSet
     http_method_names = ['get']
+    validator_versions = ['ingredient']
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию выполняется по индексу в памяти."""
+        name = request.query_params.get('name')
+
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        return self._conditional(
+            lambda request: Response(ingredient_index.search(name.strip())),
+            request)
 
 
 def short_link_redirect(request, short_code):
     """Переход по короткой ссылке рецепта."""
-    short_link_obj = get_object_or_404(ShortLink, short_code=short_code)
-    redirect_url = f'/recipes/{short_link_obj.recipe.id}/'
+    recipe_id = get_recipe_id(short_code)
+
+    if recipe_id is None:
+        raise Http404
+    redirect_url = f'/recipes/{recipe_id}/'
 
     return redirect(redirect_url)
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -91,6 +94,43 @@ DATABASES = {
     }
 }
 
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', LOCMEM_CACHE),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'feed': {
+        'BACKEND': os.getenv('FEED_CACHE_BACKEND', LOCMEM_CACHE),
+        'LOCATION': os.getenv('FEED_CACHE_LOCATION', 'feed'),
+    },
+}
+# Число записей ограничивается только в кэшах в памяти процесса, размер
+# Redis задает его параметр maxmemory.
+CACHE_MAX_ENTRIES = {
+    'default': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+    'feed': int(os.getenv('FEED_CACHE_MAX_ENTRIES', 1000)),
+}
+
+for alias, max_entries in CACHE_MAX_ENTRIES.items():
+    if CACHES[alias]['BACKEND'] == LOCMEM_CACHE:
+        CACHES[alias]['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+
+# В кэше default хранятся версии данных: по ним сбрасываются кэши ленты,
+# строятся ETag и перестраивается индекс ингредиентов. Версии должны быть
+# общими для всех процессов, включая команды manage.py, поэтому кэш в
+# памяти процесса допустим только при отладке.
+PROCESS_LOCAL_CACHES = [
+    LOCMEM_CACHE,
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+if not DEBUG and CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+    raise ImproperlyConfigured(
+        'Кэш default должен быть общим для всех процессов: укажите '
+        'CACHE_BACKEND и CACHE_LOCATION, например Redis.')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -134,6 +174,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
+# Медиафайлы хранятся под хэшем содержимого.
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Картинки в base64 передаются в теле JSON, предел совпадает с nginx.
+# Файлы multipart больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся на диск.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 STATICFILES_DIRS = [
     BASE_DIR / 'docs',
 ]
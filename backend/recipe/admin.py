@@ -1,5 +1,4 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from recipe.models import Ingredient, Recipe, RecipeIngredient, ShortLink, Tag
 
@@ -19,17 +18,9 @@ class RecipeModelAdmin(admin.ModelAdmin):
                     'pub_date',)
     search_fields = ('name', 'author__first_name', 'author__last_name')
     list_filter = ('tags',)
+    readonly_fields = ('favorites_count',)
     inlines = [IngredientInline]
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(favorites_count=Count('favorites'))
-
-    @admin.display(description='Добавления в избранное',
-                   ordering='favorites_count')
-    def favorites_count(self, obj):
-        return obj.favorites_count
-
 
 @admin.register(Ingredient)
 class IngredientModelAdmin(admin.ModelAdmin):
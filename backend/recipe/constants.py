@@ -2,3 +2,7 @@ CHAR_LENGTH = 64
 NAME_LENGTH = 20
 SHORT_CODE_LENGTH = 3
 SHORT_CODE_GENERATE_ATTEMPTS = 5
+SEARCH_CONFIG = 'russian'
+# Импорт ингредиентов: строк в пакете и символов JSON за одно чтение.
+IMPORT_BATCH_SIZE = 1000
+IMPORT_READ_SIZE = 64 * 1024
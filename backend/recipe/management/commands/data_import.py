@@ -1,23 +1,153 @@
+import csv
 import json
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.cache import bump_version, is_shared
+from recipe.constants import CHAR_LENGTH, IMPORT_BATCH_SIZE, IMPORT_READ_SIZE
 from recipe.models import Ingredient
 
+DEFAULT_PATH = Path(__file__).resolve().parent / 'data' / 'ingredients.json'
+
+
+def _iter_csv(file):
+    """Строки CSV без заголовка: название, единица измерения."""
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1] if len(row) > 1 else ''
+
+
+def _iter_json(file):
+    """Объекты JSON-массива по одному. Файл читается частями по
+    IMPORT_READ_SIZE символов, массив целиком в память не загружается."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+
+    while True:
+        chunk = file.read(IMPORT_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('Ожидался JSON-массив.')
+                started = True
+                position += 1
+                continue
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Объект не поместился в прочитанную часть.
+                break
+            yield item.get('name', ''), item.get('measurement_unit', '')
+
+        if not chunk:
+            raise CommandError('Некорректный JSON.')
+
+
+READERS = {
+    '.csv': _iter_csv,
+    '.json': _iter_json,
+}
+
 
 class Command(BaseCommand):
-    """Импорт данных в таблицу recipe Ingredient."""
+    """Импорт ингредиентов из CSV или JSON.
+
+    Файл читается потоково, строки добавляются пакетами по
+    IMPORT_BATCH_SIZE: на пакет выполняются запрос существующих пар
+    (название, единица измерения) и одна вставка. Повторный запуск не
+    создает дубликатов, ограничение уникальности пары защищает и от
+    параллельной загрузки. Кроме названия и единицы измерения полей у
+    ингредиента нет, поэтому существующие строки не обновляются, а
+    пропускаются.
+    """
+
+    help = 'Импорт ингредиентов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=str(DEFAULT_PATH),
+            help='Файл .csv или .json. По умолчанию — ingredients.json.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать новые строки, ничего не добавлять.')
 
     def handle(self, *args, **options):
-        path = './recipe/management/commands/data/ingredients.json'
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix.lower())
+
+        if reader is None:
+            raise CommandError('Поддерживаются файлы .csv и .json.')
+
+        self.counts = {'inserted': 0, 'existing': 0, 'repeated': 0,
+                       'invalid': 0}
+        self.seen = set()
+
+        try:
+            with open(path, encoding='utf-8', newline='') as file, \
+                    transaction.atomic():
+                rows = reader(file)
+
+                while batch := list(islice(rows, options['batch_size'])):
+                    self._import_batch(batch, options['dry_run'])
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+
+        if self.counts['inserted'] and not options['dry_run']:
+            bump_version('ingredient')
+
+            if not is_shared():
+                self.stdout.write(self.style.WARNING(
+                    'Кэш хранится в памяти процесса: перезапустите '
+                    'сервер, чтобы он увидел новые ингредиенты.'))
+
+        counts = self.counts
+        inserted = 'Будет добавлено' if options['dry_run'] else 'Добавлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{inserted}: {counts["inserted"]}, пропущено: '
+            f'{counts["existing"] + counts["repeated"] + counts["invalid"]} '
+            f'(уже в БД: {counts["existing"]}, повторы в файле: '
+            f'{counts["repeated"]}, некорректные: {counts["invalid"]})'))
+
+    def _import_batch(self, batch, dry_run):
+        keys = []
+
+        for name, measurement_unit in batch:
+            key = (str(name).strip(), str(measurement_unit).strip())
 
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            if not all(key) or max(map(len, key)) > CHAR_LENGTH:
+                self.counts['invalid'] += 1
+            elif key in self.seen:
+                self.counts['repeated'] += 1
+            else:
+                self.seen.add(key)
+                keys.append(key)
 
-            for item in data:
-                Ingredient.objects.create(
-                    name=item['name'],
-                    measurement_unit=item['measurement_unit']
-                )
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in keys}
+        ).values_list('name', 'measurement_unit'))
+        new = [key for key in keys if key not in existing]
+        self.counts['existing'] += len(keys) - len(new)
+        self.counts['inserted'] += len(new)
 
-            print("Данные загружены!")
+        if new and not dry_run:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in new],
+                ignore_conflicts=True)
@@ -0,0 +1,282 @@
+import random
+import string
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from recipe.models import Ingredient, Recipe, RecipeIngredient, ShortLink, Tag
+from user.models import Favorite, ShoppingCart, Subscription
+
+User = get_user_model()
+
+GENERATED_IMAGE = 'recipe-images/generated.png'
+GENERATED_SHORT_CODE_LENGTH = 8
+
+
+@contextmanager
+def _manual_pub_date():
+    """Отключение auto_now_add, чтобы сохранить сгенерированные даты
+    публикации при bulk_create."""
+    field = Recipe._meta.get_field('pub_date')
+    field.auto_now_add = False
+
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для проверки под нагрузкой.
+
+    Все строки создаются пакетными вставками. Результат детерминирован
+    для одного значения --seed. Имена пользователей строятся из префикса
+    и --seed, при повторном запуске существующие пользователи и связи
+    пропускаются. Параметр --skew задает степенное
+    распределение популярности: 1 — равномерное, чем больше значение,
+    тем сильнее активность сосредоточена на небольшой части авторов
+    и рецептов.
+    """
+
+    help = 'Генерация пользователей, рецептов и связей между ними.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Максимум ингредиентов в рецепте.')
+        parser.add_argument(
+            '--tags-per-recipe', type=int, default=3,
+            help='Максимум тегов в рецепте.')
+        parser.add_argument(
+            '--tags', type=int, default=10,
+            help='Количество тегов, если в БД их еще нет.')
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=10000)
+        parser.add_argument('--subscriptions', type=int, default=10000)
+        parser.add_argument('--short-links', type=int, default=1000)
+        parser.add_argument('--skew', type=float, default=2.0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Период, за который распределены даты публикации.')
+        parser.add_argument(
+            '--prefix', default='gen',
+            help='Префикс имен пользователей и тегов.')
+
+    def handle(self, *args, **options):
+        if options['skew'] < 1:
+            raise CommandError('--skew должен быть не меньше 1.')
+
+        self.rnd = random.Random(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.seed = options['seed']
+
+        ingredient_ids = array(
+            'q', Ingredient.objects.values_list('id', flat=True))
+
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов. Сначала выполните data_import.')
+
+        tag_ids = self._get_tag_ids(options['tags'])
+        user_ids = self._stage('Пользователи', self._create_users,
+                               options['users'])
+        recipe_ids = self._stage(
+            'Рецепты', self._create_recipes, options, user_ids, tag_ids,
+            ingredient_ids)
+        self._stage('Избранное', self._create_user_recipe_relations,
+                    Favorite, options['favorites'], user_ids, recipe_ids)
+        self._stage('Корзины', self._create_user_recipe_relations,
+                    ShoppingCart, options['carts'], user_ids, recipe_ids)
+        self._stage('Подписки', self._create_subscriptions,
+                    options['subscriptions'], user_ids)
+        self._stage('Короткие ссылки', self._create_short_links,
+                    options['short_links'], recipe_ids)
+        self._stage('Списки покупок', self._rebuild_shopping_lists)
+        self._stage('Счетчики', self._reconcile_counters)
+
+    def _stage(self, title, func, *args):
+        """Выполнение этапа генерации с выводом времени."""
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{title}: {elapsed:.1f} с')
+
+        return result
+
+    def _skewed_index(self, size):
+        """Случайный индекс с уклоном в начало последовательности."""
+        return min(size - 1, int(size * self.rnd.random() ** self.skew))
+
+    def _skewed_sample(self, ids, count, exclude=None):
+        """Выборка различных id со степенным распределением."""
+        size = len(ids)
+        count = min(count, size - (exclude is not None))
+
+        if count > size // 2:
+            chosen = set(self.rnd.sample(list(ids), min(count + 1, size)))
+            chosen.discard(exclude)
+            return list(chosen)[:count]
+
+        chosen = set()
+
+        while len(chosen) < count:
+            value = ids[self._skewed_index(size)]
+
+            if value != exclude:
+                chosen.add(value)
+        return chosen
+
+    def _distribute(self, total, size):
+        """Распределение total строк между size пользователями.
+
+        Доля пользователя i равна вероятности, с которой _skewed_index
+        выбирает i: F(i + 1) - F(i), где F(x) = (x / size) ** (1 / skew).
+        Количества считаются по округленным накопленным долям, поэтому их
+        сумма равна total без розыгрыша каждой строки.
+        """
+        power = 1 / self.skew
+        cumulative = [
+            round(total * (i / size) ** power) for i in range(size + 1)]
+
+        return array('l', (
+            cumulative[i + 1] - cumulative[i] for i in range(size)))
+
+    def _bulk_create(self, model, objs, **kwargs):
+        """Пакетная вставка с ограничением размера списка в памяти."""
+        batch = []
+
+        for obj in objs:
+            batch.append(obj)
+
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, **kwargs)
+                batch = []
+
+        if batch:
+            model.objects.bulk_create(batch, **kwargs)
+
+    def _get_tag_ids(self, count):
+        """Существующие теги или новые, если в БД их нет."""
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+        if tag_ids:
+            return tag_ids
+
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {i}', slug=f'{self.prefix}-tag-{i}')
+            for i in range(count))
+        return [tag.id for tag in tags]
+
+    def _create_users(self, count):
+        """Пользователи с именами из префикса и --seed. При конфликтах
+        вставка пропускает строки, id читаются по именам, поэтому уже
+        созданные пользователи используются повторно."""
+        password = make_password(None)
+        user_ids = array('q')
+
+        for start in range(0, count, self.batch_size):
+            usernames = [
+                f'{self.prefix}_{self.seed}_{i}'
+                for i in range(start, min(start + self.batch_size, count))]
+            User.objects.bulk_create((
+                User(username=username, email=f'{username}@example.com',
+                     first_name='Имя', last_name='Фамилия',
+                     password=password)
+                for username in usernames), ignore_conflicts=True)
+            user_ids.extend(User.objects.filter(
+                username__in=usernames).order_by('id').values_list(
+                    'id', flat=True))
+        return user_ids
+
+    def _create_recipes(self, options, user_ids, tag_ids, ingredient_ids):
+        """Рецепты создаются пакетами вместе с тегами и ингредиентами,
+        чтобы в памяти находился только текущий пакет."""
+        count = options['recipes']
+        now = timezone.now()
+        period = timedelta(days=options['days']).total_seconds()
+        recipe_ids = array('q')
+        RecipeTag = Recipe.tags.through
+
+        with _manual_pub_date():
+            for start in range(0, count, self.batch_size):
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=user_ids[self._skewed_index(len(user_ids))],
+                        name=f'Рецепт {i}',
+                        text='Описание рецепта',
+                        image=GENERATED_IMAGE,
+                        cooking_time=self.rnd.randint(1, 180),
+                        pub_date=now - timedelta(
+                            seconds=self.rnd.random() * period))
+                    for i in range(
+                        start, min(start + self.batch_size, count)))
+                ids = [recipe.id for recipe in recipes]
+                recipe_ids.extend(ids)
+
+                self._bulk_create(RecipeTag, (
+                    RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in ids
+                    for tag_id in self.rnd.sample(
+                        tag_ids, self.rnd.randint(
+                            1, min(options['tags_per_recipe'],
+                                   len(tag_ids))))))
+                self._bulk_create(RecipeIngredient, (
+                    RecipeIngredient(recipe_id=recipe_id,
+                                     ingredient_id=ingredient_id,
+                                     amount=self.rnd.randint(1, 1000))
+                    for recipe_id in ids
+                    for ingredient_id in self._skewed_sample(
+                        ingredient_ids, self.rnd.randint(
+                            1, options['ingredients_per_recipe']))))
+        return recipe_ids
+
+    def _create_user_recipe_relations(self, model, total, user_ids,
+                                      recipe_ids):
+        """Избранное и корзины: популярные рецепты встречаются чаще."""
+        counts = self._distribute(total, len(user_ids))
+
+        self._bulk_create(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id, count in zip(user_ids, counts)
+            for recipe_id in self._skewed_sample(recipe_ids, count)),
+            ignore_conflicts=True)
+
+    def _create_subscriptions(self, total, user_ids):
+        counts = self._distribute(total, len(user_ids))
+
+        self._bulk_create(Subscription, (
+            Subscription(user_id=user_id, follow_id=follow_id)
+            for user_id, count in zip(user_ids, counts)
+            for follow_id in self._skewed_sample(
+                user_ids, count, exclude=user_id)),
+            ignore_conflicts=True)
+
+    def _rebuild_shopping_lists(self):
+        """Пакетные вставки не отправляют сигналы, поэтому сохраненные
+        списки покупок пересчитываются целиком."""
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+
+    def _reconcile_counters(self):
+        call_command('reconcile_counters', stdout=self.stdout)
+
+    def _create_short_links(self, count, recipe_ids):
+        alphabet = string.ascii_letters + string.digits
+
+        self._bulk_create(ShortLink, (
+            ShortLink(recipe_id=recipe_id, short_code=''.join(
+                self.rnd.choices(alphabet, k=GENERATED_SHORT_CODE_LENGTH)))
+            for recipe_id in self._skewed_sample(recipe_ids, count)),
+            ignore_conflicts=True)
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def fill_empty_pub_date(apps, schema_editor):
+    """Рецептам без даты публикации проставить самую раннюю дату, чтобы
+    они остались в конце ленты."""
+    Recipe = apps.get_model('recipe', 'Recipe')
+    earliest = Recipe.objects.aggregate(Min('pub_date'))['pub_date__min']
+    Recipe.objects.filter(pub_date__isnull=True).update(
+        pub_date=earliest or timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0015_alter_recipeingredient_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_empty_pub_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации'),
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'default_related_name': 'recipes', 'ordering': ['-pub_date', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+    ]
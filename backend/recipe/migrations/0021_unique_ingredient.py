@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:28
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Объединить одинаковые ингредиенты перед созданием ограничения в
+    следующей миграции. Ссылки переносятся на ингредиент с меньшим id.
+    Если в рецепте или в списке покупок уже есть этот ингредиент,
+    количества складываются."""
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipe', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('user', 'ShoppingListItem')
+
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+
+    for group in duplicates:
+        keep_id = group['keep_id']
+        ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+
+        for model, owner in ((RecipeIngredient, 'recipe_id'),
+                             (ShoppingListItem, 'user_id')):
+            for row in model.objects.filter(ingredient_id__in=ids):
+                kept = model.objects.filter(
+                    ingredient_id=keep_id,
+                    **{owner: getattr(row, owner)}).first()
+
+                if kept is None:
+                    row.ingredient_id = keep_id
+                    row.save(update_fields=['ingredient'])
+                else:
+                    kept.amount += row.amount
+                    kept.save(update_fields=['amount'])
+                    row.delete()
+
+        Ingredient.objects.filter(id__in=ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0020_image_variants'),
+        ('user', '0008_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Ограничение создается в отдельной транзакции: в PostgreSQL таблицу
+    нельзя изменять, пока после удаления дубликатов в той же транзакции
+    остаются отложенные проверки внешних ключей."""
+
+    dependencies = [
+        ('recipe', '0021_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_measurement_unit'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0022_unique_ingredient_constraint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_trgm_idx',
+        ),
+    ]
@@ -2,11 +2,15 @@ import random
 import string
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Upper
 from django.db.utils import IntegrityError
 
 from .constants import (
-    CHAR_LENGTH, NAME_LENGTH, SHORT_CODE_GENERATE_ATTEMPTS, SHORT_CODE_LENGTH,
+    CHAR_LENGTH, NAME_LENGTH, SEARCH_CONFIG, SHORT_CODE_GENERATE_ATTEMPTS,
+    SHORT_CODE_LENGTH,
 )
 
 
@@ -23,7 +27,33 @@ class NameBaseModel(models.Model):
         abstract = True
 
 
-class Recipe(NameBaseModel):
+class CounterBaseModel(models.Model):
+    """Абстрактная модель с хранимыми счетчиками.
+
+    Счетчики из counter_fields меняются только атомарными UPDATE. Полное
+    сохранение существующей строки их не записывает: иначе объект,
+    загруженный до изменения счетчика, вернул бы старое значение.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')
+                and not self._state.adding):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        return super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class Recipe(CounterBaseModel, NameBaseModel):
     """Модель рецептов."""
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
@@ -31,6 +61,11 @@ class Recipe(NameBaseModel):
     image = models.ImageField(
         'Картинка',
         upload_to='recipe-images')
+    image_variants = models.JSONField(
+        'Варианты картинки',
+        default=dict,
+        blank=True,
+        editable=False)
     text = models.TextField(
         'Текстовое описание')
     ingredients = models.ManyToManyField(
@@ -44,12 +79,32 @@ class Recipe(NameBaseModel):
         'Время приготовления')
     pub_date = models.DateTimeField(
         'Дата публикации',
-        auto_now_add=True,
-        null=True)
+        auto_now_add=True)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name='Поисковый вектор')
+    favorites_count = models.PositiveIntegerField(
+        'Добавления в избранное',
+        default=0,
+        editable=False)
+
+    counter_fields = ('favorites_count',)
 
     class Meta:
         default_related_name = 'recipes'
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='recipe_name_trgm_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='recipe_search_vector_idx'),
+        ]
 
 
 class Ingredient(NameBaseModel):
@@ -58,6 +113,13 @@ class Ingredient(NameBaseModel):
         'Единица измерения',
         max_length=CHAR_LENGTH)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_measurement_unit'),
+        ]
+
 
 class RecipeIngredient(models.Model):
     """Промежуточная модель для сохранения ингредиентов в рецепте."""
@@ -84,7 +146,9 @@ class Tag(NameBaseModel):
 
 
 class ShortLink(models.Model):
-    """Модель для коротких ссылок."""
+    """Модель для коротких ссылок со случайными кодами. Новые коды
+    вычисляются из id рецепта и не сохраняются, таблица нужна для
+    переходов по ранее выданным ссылкам."""
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE)
     short_code = models.CharField(
@@ -13,9 +13,9 @@ class Migration(migrations.Migration):
         ('user', '0005_alter_shoppingcart_unique_together'),
     ]
 
-    operations = [
-        migrations.RenameModel(
-            old_name='CustomUser',
-            new_name='User',
-        ),
-    ]
+    # Модель CustomUser переименовывалась здесь в User. Сторонние
+    # миграции (admin, authtoken) ссылаются на AUTH_USER_MODEL, то есть
+    # на user.User, и в новой БД выполняются раньше переименования,
+    # поэтому 0001_initial сразу создает User. В уже развернутых БД эта
+    # миграция применена, таблица переименована.
+    operations = []
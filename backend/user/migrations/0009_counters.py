@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-17 06:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    """Заполнить счетчики по текущим данным."""
+    User = apps.get_model('user', 'User')
+    Recipe = apps.get_model('recipe', 'Recipe')
+    Subscription = apps.get_model('user', 'Subscription')
+    Favorite = apps.get_model('user', 'Favorite')
+
+    User.objects.update(
+        recipes_count=_count(Recipe, 'author'),
+        followers_count=_count(Subscription, 'follow'))
+    Recipe.objects.update(favorites_count=_count(Favorite, 'recipe'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0019_counters'),
+        ('user', '0008_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
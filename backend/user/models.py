@@ -3,11 +3,11 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
-from recipe.models import Recipe
+from recipe.models import CounterBaseModel, Ingredient, Recipe
 from user.constants import MAX_LENGTH
 
 
-class User(AbstractUser):
+class User(CounterBaseModel, AbstractUser):
     """Реализация дополнительных полей модели пользователя."""
     username = models.CharField(
         'Имя пользователя',
@@ -24,6 +24,21 @@ class User(AbstractUser):
     avatar = models.ImageField(
         upload_to='avatars/',
         blank=True)
+    avatar_variants = models.JSONField(
+        'Варианты аватара',
+        default=dict,
+        blank=True,
+        editable=False)
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False)
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ['username']
@@ -77,3 +92,20 @@ class ShoppingCart(UserRecipeAbstractModel):
 
     class Meta:
         default_related_name = 'shopping_cart'
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по рецептам из корзины пользователя. Строки
+    обновляются на разницу при изменении корзины и ингредиентов рецептов,
+    полный пересчет выполняет команда rebuild_shopping_lists."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list')
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        verbose_name='Ингредиент')
+    amount = models.IntegerField('Количество')
+
+    class Meta:
+        unique_together = ('user', 'ingredient')